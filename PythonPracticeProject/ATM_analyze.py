@@ -1,59 +1,184 @@
+import argparse
+import json
+import os
+from functools import partial
+
 import pandas as pd
-from sqlalchemy import create_engine
 from database_config import MYSQLConfig
+from engine_factory import connection, dispose_engines, get_engine, print_checkout_metrics
+from sql_aggregates import ROW_COLUMNS, address_rows, cube_by, dataset_version, row_query
+from aggregation_cube import AggregationCube
+from atm_store import ATMStore
+from data_sources import SnapshotSource
+from sqlalchemy.exc import SQLAlchemyError
 import folium
 from folium import plugins
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from pyproj import Transformer
+from projection import ensure_wgs84
+from density_tiles import (DEFAULT_ZOOM_LEVELS, EMBEDDED_ZOOM_LEVELS, DensityTileLayer, build_density_tiles,
+                           write_density_tiles)
+from instrumentation import get_recorder, stage
+from kde_surface import add_kde_layers, kernel_density, print_ward_peaks, ward_peak_density
+from result_cache import ResultCache, capture_output
+
+HEATMAP_FILE = 'atm_density_heatmap.html'
+
+# (minimum ward ATM count, marker color, icon), highest threshold first
+DENSITY_LEVELS = [
+    (50, 'red', 'fire'),
+    (30, 'orange', 'star'),
+    (20, 'yellow', 'info-sign'),
+    (10, 'blue', 'ok-sign'),
+    (0, 'green', 'minus-sign'),
+]
+
+# Browser-side marker factory for FastMarkerCluster rows:
+# [lat, lon, level, ward, ward_count, zip, name, address]
+CLUSTER_MARKER_CALLBACK = """(function () {
+    var levels = %s;
+    return function (row) {
+        var style = levels[row[2]];
+        var marker = L.marker(new L.LatLng(row[0], row[1]));
+        marker.setIcon(L.AwesomeMarkers.icon({markerColor: style[0], icon: style[1]}));
+        marker.bindTooltip('Ward ' + row[3] + ': ' + row[4] + ' ATMs');
+        marker.bindPopup('<b>' + row[6] + '</b><br>Address: ' + row[7] + '<br>Ward: ' + row[3] +
+                         ' (' + row[4] + ' ATMs)<br>ZIP: ' + row[5]);
+        return marker;
+    };
+})()""" % json.dumps([[color, icon] for _, color, icon in DENSITY_LEVELS])
 
 
 class ATMDensityAnalyzer:
-    def __init__(self):
-        """Initialize the ATM Density Analyzer"""
-        self.config = MYSQLConfig(
-            host='localhost',
-            port=3306,
-            user='root',
-            password='123',
-            table='ATM_DATA',
-            database='ATM_DATA'
-        )
-
-        # Create SQLAlchemy engine
-        url = f"mysql+mysqlconnector://{self.config.user}:{self.config.password}@{self.config.host}:{self.config.port}/{self.config.database}"
-        self.engine = create_engine(url)
+    def __init__(self, engine=None, aggregation='sql', source=None, cache=None, boundaries=None):
+        """Initialize the ATM Density Analyzer
+
+        Ward/ZIP/brand reports are roll-ups of one (WARD, ZIPCODE, NAME) AggregationCube.
+        aggregation='sql' builds the cube with a single GROUP BY in the database and transfers
+        only the occupied cells; aggregation='pandas' builds it from the loaded rows in memory.
+        source (see data_sources) replaces the database entirely, e.g. a SnapshotSource
+        for offline runs; aggregation then always happens in pandas.
+        With a ResultCache, run_analysis reuses the previous run's results while the
+        dataset fingerprint is unchanged.
+        With Boundaries (see spatial_join), rows missing WARD/ZIPCODE are kept and assigned
+        from their coordinates, and stored values that disagree are flagged; the cube is
+        then built in memory so the backfilled rows are counted.
+        """
+        self.config = MYSQLConfig.from_env()
+        self.source = source
+        self.aggregation = 'pandas' if source is not None else aggregation
+        self.cube = None
+        self.cache = cache
+        self.store = None
+        self.address_loader = None
+        self.boundaries = boundaries
+        self.join_report = None
+        self.boundary_mismatches = None
+
+        # Shared pooled SQLAlchemy engine (see engine_factory); not needed for offline sources
+        self.engine = None if source is not None else (engine or get_engine(self.config))
+
+    def dataset_version(self):
+        """Cheap fingerprint of the data load_data would read"""
+        boundaries = self.boundaries.version() if self.boundaries is not None else None
+        if self.source is not None:
+            return type(self.source).__name__, self.source.version(), boundaries
+        with connection(self.engine) as conn:
+            return dataset_version(conn, where=self.row_filter()), boundaries
+
+    def row_filter(self):
+        """WHERE clause of the rows load_data reads from the database"""
+        if self.boundaries is not None:
+            # Rows missing WARD/ZIPCODE are loaded for the spatial join to fill in
+            return "DELETED = 0"
+        return "DELETED = 0 AND WARD IS NOT NULL AND ZIPCODE IS NOT NULL"
 
     def load_data(self):
-        """Load ATM data from database"""
-        query = "SELECT * FROM ATM_DATA WHERE WARD IS NOT NULL AND ZIPCODE IS NOT NULL"
-        self.df = pd.read_sql(query, self.engine)
-        print(f"Loaded {len(self.df)} ATM records with valid ward and ZIP code data.")
+        """Load ATM data from the configured source (database by default)"""
+        if self.source is not None:
+            self.df = self.source.load()
+            self.cube = None
+            self.address_loader = None
+            print(f"Loaded {len(self.df)} ATM records from {type(self.source).__name__}.")
+            return
+
+        # Addresses are only needed for map popups; they are read on demand (see ATMStore)
+        columns = [column for column in ROW_COLUMNS if column != 'ADDRESS']
+        query = row_query(where=self.row_filter(), columns=columns)
+        with connection(self.engine) as conn:
+            self.df = pd.read_sql(query, conn)
+        self.cube = None
+        self.address_loader = partial(self._address_table, self.df['OBJECTID'].to_numpy())
+        if self.boundaries is not None:
+            print(f"Loaded {len(self.df)} ATM records, including any missing ward or ZIP code data.")
+        else:
+            print(f"Loaded {len(self.df)} ATM records with valid ward and ZIP code data.")
+
+    def _address_table(self, object_ids):
+        """ADDRESS of each OBJECTID, in the given order"""
+        with connection(self.engine) as conn:
+            addresses = address_rows(conn)
+        return addresses.set_index('OBJECTID')['ADDRESS'].reindex(object_ids).to_numpy(dtype=object)
 
     def convert_coordinates(self):
-        """Convert coordinates from State Plane to WGS84"""
-        transformer = Transformer.from_crs("EPSG:2893", "EPSG:4326", always_xy=True)
-        self.df['longitude'], self.df['latitude'] = transformer.transform(
-            self.df['X'].values, self.df['Y'].values
-        )
-
-        # Filter out invalid coordinates
-        valid_coords = (
-                self.df['latitude'].notna() & self.df['longitude'].notna() &
-                (self.df['latitude'].between(-90, 90)) &
-                (self.df['longitude'].between(-180, 180))
-        )
-        self.df = self.df[valid_coords]
+        """Filter to valid WGS84 coordinates, projecting X/Y only if ingest did not store them
+
+        The valid rows are kept in a compact ATMStore; self.df becomes a no-copy frame
+        over its columns, so the loaded schema columns are released.
+        """
+        df, valid_coords = ensure_wgs84(self.df)
+        if self.boundaries is not None:
+            df, valid_coords = self.join_boundaries(df, valid_coords)
+        else:
+            # File sources keep NULL-keyed rows; drop them here like the database query does
+            valid_coords = valid_coords & df['WARD'].notna().values & df['ZIPCODE'].notna().values
+        self.store = ATMStore.from_frame(df, valid_coords, self.address_loader)
+        self.df = self.store.frame()
+        self.cube = None
         print(f"Valid coordinates for {len(self.df)} ATMs after coordinate conversion.")
 
+    def join_boundaries(self, df, valid_coords):
+        """Assign WARD/ZIPCODE from the boundary files; rows still missing either are dropped"""
+        # Imported here so the analysis runs without shapely unless boundaries are given
+        from spatial_join import mismatch_rows, print_join_report, spatial_join
+
+        df, self.join_report = spatial_join(df, self.boundaries)
+        self.boundary_mismatches = mismatch_rows(df[valid_coords])
+        print_join_report(self.join_report)
+        return df, valid_coords & df['WARD'].notna().values & df['ZIPCODE'].notna().values
+
+    def _run_sql(self, aggregate, *args):
+        """Run a sql_aggregates query, switching to the pandas path if the database can't serve it"""
+        try:
+            with connection(self.engine) as conn:
+                return aggregate(conn, *args)
+        except SQLAlchemyError as e:
+            print(f"SQL aggregation failed, falling back to pandas: {e}")
+            self.aggregation = 'pandas'
+            return None
+
+    def aggregation_cube(self):
+        """The (WARD, ZIPCODE, NAME) count/centroid cube of the loaded ATMs, built once per load"""
+        if self.cube is None:
+            # The database's WARD/ZIPCODE miss whatever the spatial join filled in
+            if self.aggregation == 'sql' and self.boundaries is None:
+                groups = self._run_sql(cube_by)
+                if groups is not None:
+                    self.cube = AggregationCube.from_groups(groups)
+            if self.cube is None:
+                self.cube = AggregationCube.from_frame(self.df)
+        return self.cube
+
+    def density_stats(self, column):
+        """ATM count and centroid per WARD or ZIPCODE"""
+        return self.aggregation_cube().roll_up(column)
+
+    def type_counts(self, column):
+        """ATM counts per (WARD or ZIPCODE, NAME) crosstab"""
+        return self.aggregation_cube().crosstab(column, 'NAME')
+
     def analyze_ward_density(self):
         """Analyze ATM density by ward"""
-        ward_stats = self.df.groupby('WARD').agg({
-            'NAME': 'count',
-            'latitude': 'mean',
-            'longitude': 'mean'
-        }).rename(columns={'NAME': 'atm_count'}).reset_index()
+        ward_stats = self.density_stats('WARD')
 
         # Calculate density rank
         ward_stats['density_rank'] = ward_stats['atm_count'].rank(ascending=False)
@@ -65,19 +190,16 @@ class ATMDensityAnalyzer:
         print(f"{'Ward':<6} {'ATM Count':<12} {'Density Rank':<14} {'Center Lat':<12} {'Center Lon':<12}")
         print("-" * 68)
 
-        for _, row in ward_stats.iterrows():
-            print(f"{int(row['WARD']):<6} {int(row['atm_count']):<12} {int(row['density_rank']):<14} "
-                  f"{row['latitude']:.6f} {row['longitude']:.6f}")
+        for ward, count, rank, lat, lon in zip(ward_stats['WARD'], ward_stats['atm_count'],
+                                               ward_stats['density_rank'], ward_stats['latitude'],
+                                               ward_stats['longitude']):
+            print(f"{int(ward):<6} {int(count):<12} {int(rank):<14} {lat:.6f} {lon:.6f}")
 
         return ward_stats
 
     def analyze_zip_density(self):
         """Analyze ATM density by ZIP code"""
-        zip_stats = self.df.groupby('ZIPCODE').agg({
-            'NAME': 'count',
-            'latitude': 'mean',
-            'longitude': 'mean'
-        }).rename(columns={'NAME': 'atm_count'}).reset_index()
+        zip_stats = self.density_stats('ZIPCODE')
 
         # Calculate density rank
         zip_stats['density_rank'] = zip_stats['atm_count'].rank(ascending=False)
@@ -90,9 +212,10 @@ class ATMDensityAnalyzer:
         print(f"{'ZIP Code':<10} {'ATM Count':<12} {'Density Rank':<14} {'Center Lat':<12} {'Center Lon':<12}")
         print("-" * 74)
 
-        for _, row in zip_stats.head(15).iterrows():
-            print(f"{int(row['ZIPCODE']):<10} {int(row['atm_count']):<12} {int(row['density_rank']):<14} "
-                  f"{row['latitude']:.6f} {row['longitude']:.6f}")
+        top = zip_stats.head(15)
+        for zipcode, count, rank, lat, lon in zip(top['ZIPCODE'], top['atm_count'], top['density_rank'],
+                                                  top['latitude'], top['longitude']):
+            print(f"{int(zipcode):<10} {int(count):<12} {int(rank):<14} {lat:.6f} {lon:.6f}")
 
         return zip_stats
 
@@ -102,7 +225,7 @@ class ATMDensityAnalyzer:
         print("ATM TYPES BY WARD")
         print("=" * 50)
 
-        ward_atm_types = self.df.groupby(['WARD', 'NAME']).size().unstack(fill_value=0)
+        ward_atm_types = self.type_counts('WARD')
         print(ward_atm_types.head(10))
 
         print("\n" + "=" * 50)
@@ -110,15 +233,50 @@ class ATMDensityAnalyzer:
         print("=" * 50)
 
         # Get top 10 ZIP codes by ATM count
-        top_zips = self.df['ZIPCODE'].value_counts().head(10).index
-        zip_atm_types = self.df[self.df['ZIPCODE'].isin(top_zips)].groupby(['ZIPCODE', 'NAME']).size().unstack(
-            fill_value=0)
+        zip_types = self.type_counts('ZIPCODE')
+        top_zips = zip_types.sum(axis=1).sort_values(ascending=False, kind='stable').head(10).index
+        zip_atm_types = zip_types[zip_types.index.isin(top_zips)]
+        zip_atm_types = zip_atm_types.loc[:, zip_atm_types.sum() > 0]
         print(zip_atm_types)
 
         return ward_atm_types, zip_atm_types
 
-    def create_density_heatmap(self, ward_stats, zip_stats):
-        """Create interactive heatmap showing ATM density"""
+    def ward_density_styles(self, ward_stats):
+        """Join ward ATM counts onto every ATM and derive its density level in one vectorized pass"""
+        ward_density = self.df['WARD'].map(ward_stats.set_index('WARD')['atm_count']).fillna(0).astype(int)
+        thresholds = np.array([level[0] for level in DENSITY_LEVELS])
+        # DENSITY_LEVELS is ordered from the highest threshold down
+        level = (ward_density.values[:, None] < thresholds[None, :]).sum(axis=1)
+        return ward_density.values, level
+
+    def precompute_density_tiles(self, out_dir=None, zoom_levels=DEFAULT_ZOOM_LEVELS):
+        """Bin ATMs into multi-zoom quadtree density cells, optionally writing them as tile files"""
+        tiles = build_density_tiles(self.df['latitude'].values, self.df['longitude'].values, zoom_levels)
+        if out_dir is not None:
+            write_density_tiles(tiles, out_dir)
+        return tiles
+
+    def analyze_kernel_density(self, bandwidth_m=None, cell_m=50):
+        """Server-side Gaussian KDE surface of the ATMs plus peak density per ward"""
+        surface = kernel_density(self.df['latitude'].values, self.df['longitude'].values,
+                                 bandwidth_m=bandwidth_m, cell_m=cell_m)
+        print_ward_peaks(ward_peak_density(surface, self.df), surface)
+        return surface
+
+    def create_density_heatmap(self, ward_stats, zip_stats, render_mode='markers', tiles_url=None, kde=None,
+                               tiles_dir=None):
+        """Create interactive heatmap showing ATM density
+
+        render_mode='markers' emits one folium.Marker per ATM; render_mode='cluster' ships the
+        ATMs as one compact JSON array to a FastMarkerCluster that builds markers in the browser,
+        so generation time and HTML size stay flat as the number of ATMs grows.
+        render_mode='tiles' replaces markers and the client-side HeatMap with precomputed
+        per-zoom density cells. With tiles_dir the tiles are written there and fetched per
+        viewport from tiles_url (default: tiles_dir relative to the map); with only tiles_url
+        they are assumed to be served already. Otherwise only EMBEDDED_ZOOM_LEVELS are embedded.
+        A KDESurface from analyze_kernel_density is drawn as a raster with contours in place
+        of the client-side HeatMap.
+        """
         # Center map on DC area
         center_lat = self.df['latitude'].mean()
         center_lon = self.df['longitude'].mean()
@@ -130,41 +288,63 @@ class ATMDensityAnalyzer:
             tiles='OpenStreetMap'
         )
 
-        # Add ATM markers with different colors based on density
-        for _, row in self.df.iterrows():
-            ward = int(row['WARD'])
-            ward_density = ward_stats[ward_stats['WARD'] == ward]['atm_count'].iloc[0]
-
-            # Color coding based on ward density
-            if ward_density >= 50:
-                color = 'red'
-                icon = 'fire'
-            elif ward_density >= 30:
-                color = 'orange'
-                icon = 'star'
-            elif ward_density >= 20:
-                color = 'yellow'
-                icon = 'info-sign'
-            elif ward_density >= 10:
-                color = 'blue'
-                icon = 'ok-sign'
+        # Ward density and color level for every ATM, via a join instead of a per-row lookup
+        ward_density, level = self.ward_density_styles(ward_stats)
+        wards = self.df['WARD'].astype(int).values
+        zipcodes = self.df['ZIPCODE'].astype(int).values
+        latitudes = self.df['latitude'].values
+        longitudes = self.df['longitude'].values
+
+        if render_mode == 'tiles':
+            # Payload depends on occupied cells in view, not on the number of ATMs
+            if tiles_dir is not None:
+                tiles = self.precompute_density_tiles(out_dir=tiles_dir)
+                if tiles_url is None:
+                    map_dir = os.path.dirname(os.path.abspath(HEATMAP_FILE))
+                    tiles_url = os.path.relpath(os.path.abspath(tiles_dir), map_dir).replace(os.sep, '/')
+            elif tiles_url is not None:
+                tiles = self.precompute_density_tiles()
             else:
-                color = 'green'
-                icon = 'minus-sign'
-
-            folium.Marker(
-                location=[row['latitude'], row['longitude']],
-                popup=f"<b>{row['NAME']}</b><br>"
-                      f"Address: {row['ADDRESS']}<br>"
-                      f"Ward: {ward} ({ward_density} ATMs)<br>"
-                      f"ZIP: {int(row['ZIPCODE'])}",
-                icon=folium.Icon(color=color, icon=icon),
-                tooltip=f"Ward {ward}: {ward_density} ATMs"
-            ).add_to(density_map)
-
-        # Add heat map layer
-        heat_data = [[row['latitude'], row['longitude']] for _, row in self.df.iterrows()]
-        plugins.HeatMap(heat_data, radius=15, blur=10, max_zoom=1).add_to(density_map)
+                tiles = self.precompute_density_tiles(zoom_levels=EMBEDDED_ZOOM_LEVELS)
+            DensityTileLayer(tiles, tiles_url=tiles_url).add_to(density_map)
+            if kde is not None:
+                add_kde_layers(density_map, kde)
+                folium.LayerControl().add_to(density_map)
+            density_map.save(HEATMAP_FILE)
+            print(f"\nDensity heatmap saved as '{HEATMAP_FILE}'")
+            return
+
+        if render_mode == 'cluster':
+            data = np.column_stack((
+                latitudes.round(6), longitudes.round(6), level, wards, ward_density, zipcodes
+            )).tolist()
+            for row, name, address in zip(data, self.df['NAME'].values, self.store.addresses()):
+                row.extend((name, address))
+            plugins.FastMarkerCluster(data, callback=CLUSTER_MARKER_CALLBACK, name='ATMs').add_to(density_map)
+        else:
+            # Add ATM markers with different colors based on density
+            for lat, lon, name, address, ward, zipcode, count, idx in zip(
+                    latitudes, longitudes, self.df['NAME'].values, self.store.addresses(),
+                    wards, zipcodes, ward_density, level):
+                color, icon = DENSITY_LEVELS[idx][1], DENSITY_LEVELS[idx][2]
+                folium.Marker(
+                    location=[lat, lon],
+                    popup=f"<b>{name}</b><br>"
+                          f"Address: {address}<br>"
+                          f"Ward: {ward} ({count} ATMs)<br>"
+                          f"ZIP: {zipcode}",
+                    icon=folium.Icon(color=color, icon=icon),
+                    tooltip=f"Ward {ward}: {count} ATMs"
+                ).add_to(density_map)
+
+        if kde is not None:
+            # Server-side KDE: the surface no longer depends on the browser's radius/blur
+            add_kde_layers(density_map, kde)
+            folium.LayerControl().add_to(density_map)
+        else:
+            # Add heat map layer
+            heat_data = np.column_stack((latitudes.round(6), longitudes.round(6))).tolist()
+            plugins.HeatMap(heat_data, radius=15, blur=10, max_zoom=1).add_to(density_map)
 
         # Add legend
         legend_html = '''
@@ -183,8 +363,8 @@ class ATMDensityAnalyzer:
         density_map.get_root().html.add_child(folium.Element(legend_html))
 
         # Save the map
-        density_map.save('atm_density_heatmap.html')
-        print(f"\nDensity heatmap saved as 'atm_density_heatmap.html'")
+        density_map.save(HEATMAP_FILE)
+        print(f"\nDensity heatmap saved as '{HEATMAP_FILE}'")
 
     def generate_summary_statistics(self, ward_stats, zip_stats):
         """Generate summary statistics"""
@@ -192,7 +372,7 @@ class ATMDensityAnalyzer:
         print("SUMMARY STATISTICS")
         print("=" * 50)
 
-        total_atms = len(self.df)
+        total_atms = self.aggregation_cube().total
         total_wards = len(ward_stats)
         total_zips = len(zip_stats)
 
@@ -202,54 +382,138 @@ class ATMDensityAnalyzer:
         print(f"Average ATMs per Ward: {total_atms / total_wards:.1f}")
         print(f"Average ATMs per ZIP: {total_atms / total_zips:.1f}")
 
-        print(f"\nHighest density Ward: {ward_stats.iloc[0]['WARD']} ({ward_stats.iloc[0]['atm_count']} ATMs)")
-        print(f"Lowest density Ward: {ward_stats.iloc[-1]['WARD']} ({ward_stats.iloc[-1]['atm_count']} ATMs)")
-
-        print(f"\nHighest density ZIP: {zip_stats.iloc[0]['ZIPCODE']} ({zip_stats.iloc[0]['atm_count']} ATMs)")
-        print(f"Lowest density ZIP: {zip_stats.iloc[-1]['ZIPCODE']} ({zip_stats.iloc[-1]['atm_count']} ATMs)")
-
-    def run_analysis(self):
-        """Run complete density analysis"""
+        wards, ward_counts = ward_stats['WARD'].values, ward_stats['atm_count'].values
+        print(f"\nHighest density Ward: {wards[0]} ({ward_counts[0]} ATMs)")
+        print(f"Lowest density Ward: {wards[-1]} ({ward_counts[-1]} ATMs)")
+
+        zipcodes, zip_counts = zip_stats['ZIPCODE'].values, zip_stats['atm_count'].values
+        print(f"\nHighest density ZIP: {zipcodes[0]} ({zip_counts[0]} ATMs)")
+        print(f"Lowest density ZIP: {zipcodes[-1]} ({zip_counts[-1]} ATMs)")
+
+    def run_analysis(self, render_mode='markers', density_layer='heatmap', kde_bandwidth_m=None,
+                     tiles_dir=None, tiles_url=None, kde_cell_m=50):
+        """Run complete density analysis
+
+        Every step runs inside an instrumentation stage (see instrumentation.py); with
+        ATM_TIMING unset these are no-ops. density_layer='kde' replaces the client-side
+        HeatMap with a server-side KDE surface (bandwidth kde_bandwidth_m, Scott's rule by default,
+        on kde_cell_m cells).
+        tiles_dir/tiles_url select where render_mode='tiles' writes and fetches its tiles.
+        With a cache, an unchanged dataset replays the stored report and map instead.
+        """
+        if self.cache is None:
+            return self._run_uncached(render_mode, density_layer, kde_bandwidth_m, tiles_dir, tiles_url, kde_cell_m)
+
+        namespace = ('run_analysis', render_mode, density_layer, kde_bandwidth_m, tiles_dir, tiles_url, kde_cell_m)
+        fingerprint = self.dataset_version()
+        cached = self.cache.get(namespace, fingerprint)
+        if cached is not None:
+            with stage('run_analysis', render_mode=render_mode, cached=True):
+                print(cached['report'], end='')
+                with open(HEATMAP_FILE, 'w', encoding='utf-8') as file:
+                    file.write(cached['map_html'])
+            print("(Served from the result cache: ATM data unchanged since the last run)")
+            return cached['results']
+
+        with capture_output() as report:
+            results = self._run_uncached(render_mode, density_layer, kde_bandwidth_m, tiles_dir, tiles_url, kde_cell_m)
+        with open(HEATMAP_FILE, encoding='utf-8') as file:
+            map_html = file.read()
+        self.cache.put(namespace, fingerprint, {'results': results, 'report': report.getvalue(), 'map_html': map_html})
+        return results
+
+    def _run_uncached(self, render_mode, density_layer, kde_bandwidth_m, tiles_dir=None, tiles_url=None,
+                      kde_cell_m=50):
         print("Starting ATM Density Analysis...")
         print("=" * 50)
 
-        # Load and prepare data
-        self.load_data()
-        self.convert_coordinates()
-
-        # Perform analyses
-        ward_stats = self.analyze_ward_density()
-        zip_stats = self.analyze_zip_density()
-        ward_atm_types, zip_atm_types = self.analyze_atm_types_by_area()
-
-        # Generate visualizations
-        self.create_density_heatmap(ward_stats, zip_stats)
-
-        # Generate summary
-        self.generate_summary_statistics(ward_stats, zip_stats)
+        with stage('run_analysis', render_mode=render_mode, aggregation=self.aggregation) as run:
+            # Load and prepare data
+            with stage('load') as s:
+                self.load_data()
+                s.rows = len(self.df)
+            with stage('project') as s:
+                self.convert_coordinates()
+                s.rows = len(self.df)
+
+            # Perform analyses
+            with stage('ward_density') as s:
+                ward_stats = self.analyze_ward_density()
+                s.rows = len(ward_stats)
+            with stage('zip_density') as s:
+                zip_stats = self.analyze_zip_density()
+                s.rows = len(zip_stats)
+            with stage('atm_types') as s:
+                ward_atm_types, zip_atm_types = self.analyze_atm_types_by_area()
+                s.rows = len(ward_atm_types)
+
+            kde = None
+            if density_layer == 'kde':
+                with stage('kde') as s:
+                    kde = self.analyze_kernel_density(bandwidth_m=kde_bandwidth_m, cell_m=kde_cell_m)
+                    s.rows = kde.grid.size
+
+            # Generate visualizations
+            with stage('render') as s:
+                self.create_density_heatmap(ward_stats, zip_stats, render_mode=render_mode, kde=kde,
+                                            tiles_dir=tiles_dir, tiles_url=tiles_url)
+                s.rows = len(self.df)
+
+            # Generate summary
+            self.generate_summary_statistics(ward_stats, zip_stats)
+            run.rows = len(self.df)
 
         print("\n" + "=" * 50)
         print("Analysis complete! Check the generated files:")
-        print("- atm_density_heatmap.html: Interactive density map")
+        print(f"- {HEATMAP_FILE}: Interactive density map")
         print("=" * 50)
 
-        # Close database connection
-        self.engine.dispose()
-
         return ward_stats, zip_stats, ward_atm_types, zip_atm_types
 
 
-def main():
+def main(render_mode='markers', snapshot=None, density_layer='heatmap', kde_bandwidth_m=None, use_cache=True,
+         ward_boundaries=None, zip_boundaries=None, tiles_dir=None, tiles_url=None, kde_cell_m=50):
     """Main function to run ATM density analysis"""
     try:
-        analyzer = ATMDensityAnalyzer()
-        ward_stats, zip_stats, ward_atm_types, zip_atm_types = analyzer.run_analysis()
+        boundaries = None
+        if ward_boundaries or zip_boundaries:
+            # Imported here so the analysis runs without shapely unless boundaries are given
+            from spatial_join import Boundaries
+            boundaries = Boundaries.from_files(ward_boundaries, zip_boundaries)
+
+        analyzer = ATMDensityAnalyzer(source=SnapshotSource(snapshot) if snapshot else None,
+                                      cache=ResultCache.from_env() if use_cache else None, boundaries=boundaries)
+        ward_stats, zip_stats, ward_atm_types, zip_atm_types = analyzer.run_analysis(
+            render_mode=render_mode, density_layer=density_layer, kde_bandwidth_m=kde_bandwidth_m,
+            tiles_dir=tiles_dir, tiles_url=tiles_url, kde_cell_m=kde_cell_m)
         return ward_stats, zip_stats, ward_atm_types, zip_atm_types
 
     except Exception as e:
         print(f"An error occurred during analysis: {e}")
         return None, None, None, None
+    finally:
+        get_recorder().print_summary()
+        print_checkout_metrics()
+        dispose_engines()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the ATM density analysis")
+    parser.add_argument("--snapshot", help="read a columnar snapshot (see data_sources.py) instead of MySQL")
+    parser.add_argument("--render-mode", choices=["markers", "cluster", "tiles"], default="markers")
+    parser.add_argument("--density-layer", choices=["heatmap", "kde"], default="heatmap",
+                        help="'kde' draws a server-side kernel density raster and contours")
+    parser.add_argument("--kde-bandwidth-m", type=float, default=None, help="KDE bandwidth (default: Scott's rule)")
+    parser.add_argument("--kde-cell-m", type=float, default=50,
+                        help="KDE grid cell size; coarsened automatically for very large areas")
+    parser.add_argument("--no-cache", action="store_true", help="recompute even if the data is unchanged")
+    parser.add_argument("--ward-boundaries", help="ward GeoJSON/shapefile to backfill and check WARD from coordinates")
+    parser.add_argument("--zip-boundaries", help="ZIP GeoJSON/shapefile to backfill and check ZIPCODE from coordinates")
+    parser.add_argument("--tiles-dir", help="with --render-mode tiles: write density tiles here for the map to fetch")
+    parser.add_argument("--tiles-url", help="with --render-mode tiles: URL the tiles are served from "
+                                            "(default: --tiles-dir relative to the map)")
+    args = parser.parse_args()
+    main(render_mode=args.render_mode, snapshot=args.snapshot, density_layer=args.density_layer,
+         kde_bandwidth_m=args.kde_bandwidth_m, use_cache=not args.no_cache,
+         ward_boundaries=args.ward_boundaries, zip_boundaries=args.zip_boundaries,
+         tiles_dir=args.tiles_dir, tiles_url=args.tiles_url, kde_cell_m=args.kde_cell_m)
\ No newline at end of file
@@ -0,0 +1,99 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ('WARD', 'ZIPCODE', 'NAME')
+
+
+@dataclass
+class AggregationCube:
+    """ATM count and coordinate sums per non-empty (WARD, ZIPCODE, NAME) cell
+
+    keys holds the distinct values of each dimension (sorted); codes holds, per cell,
+    the position of its value in keys. Every ward/ZIP/brand report is a roll-up of
+    these cells, so the rows are scanned once however many reports are derived.
+    """
+    keys: dict  # dimension -> np.ndarray of distinct values
+    codes: dict  # dimension -> np.ndarray of per-cell codes into keys
+    count: np.ndarray
+    lat_sum: np.ndarray
+    lon_sum: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build the cube from row-level data in one pass over integer-coded keys"""
+        keys, codes = {}, []
+        for dimension in DIMENSIONS:
+            dimension_codes, uniques = pd.factorize(df[dimension], sort=True)
+            keys[dimension] = np.asarray(uniques)
+            codes.append(dimension_codes)
+
+        cells, cell_codes = _occupied(codes, [len(keys[dimension]) for dimension in DIMENSIONS])
+        size = len(cell_codes[0])
+        count = np.bincount(cells, minlength=size)
+        lat_sum = np.bincount(cells, weights=df['latitude'].to_numpy(dtype=np.float64), minlength=size)
+        lon_sum = np.bincount(cells, weights=df['longitude'].to_numpy(dtype=np.float64), minlength=size)
+        return cls(keys, dict(zip(DIMENSIONS, cell_codes)), count, lat_sum, lon_sum)
+
+    @classmethod
+    def from_groups(cls, groups):
+        """Build the cube from pre-grouped rows (WARD, ZIPCODE, NAME, atm_count, lat_sum, lon_sum)"""
+        keys, codes = {}, {}
+        for dimension in DIMENSIONS:
+            codes[dimension], uniques = pd.factorize(groups[dimension], sort=True)
+            keys[dimension] = np.asarray(uniques)
+        return cls(keys, codes, groups['atm_count'].to_numpy(dtype=np.int64),
+                   groups['lat_sum'].to_numpy(dtype=np.float64), groups['lon_sum'].to_numpy(dtype=np.float64))
+
+    @property
+    def total(self):
+        return int(self.count.sum())
+
+    def _group(self, dimensions):
+        """Group index of every cell over the given dimensions, and the codes of each group"""
+        return _occupied([self.codes[dimension] for dimension in dimensions],
+                         [len(self.keys[dimension]) for dimension in dimensions])
+
+    def roll_up(self, *dimensions):
+        """ATM count and centroid per combination of dimensions, sorted by key
+
+        roll_up('WARD') gives the WARD, atm_count, latitude, longitude frame of the ward report.
+        """
+        groups, group_codes = self._group(dimensions)
+        size = len(group_codes[0])
+        count = np.bincount(groups, weights=self.count, minlength=size)
+
+        result = {dimension: self.keys[dimension][codes] for dimension, codes in zip(dimensions, group_codes)}
+        result['atm_count'] = count.astype(np.int64)
+        result['latitude'] = np.bincount(groups, weights=self.lat_sum, minlength=size) / count
+        result['longitude'] = np.bincount(groups, weights=self.lon_sum, minlength=size) / count
+        return pd.DataFrame(result)
+
+    def crosstab(self, row, column='NAME'):
+        """Counts with one dimension as rows and another as columns, e.g. ATMs per ward and brand"""
+        # Like groupby(...).size().unstack(), only keys that occur appear, so the table is
+        # sized by the occupied rows and columns rather than every key of the dimensions
+        rows, row_index = np.unique(self.codes[row], return_inverse=True)
+        columns, column_index = np.unique(self.codes[column], return_inverse=True)
+        table = np.bincount(row_index * len(columns) + column_index, weights=self.count,
+                            minlength=len(rows) * len(columns)).astype(np.int64).reshape(len(rows), len(columns))
+        return pd.DataFrame(table,
+                            index=pd.Index(self.keys[row][rows], name=row),
+                            columns=pd.Index(self.keys[column][columns], name=column))
+
+
+def _occupied(codes, sizes):
+    """Index of every row's key combination among the combinations that occur, and their codes
+
+    codes holds one integer code array per dimension (codes[i] < sizes[i]). Combinations
+    are numbered in sorted key order one dimension at a time, so the intermediate keys
+    stay below rows * sizes[i] and nothing is ever sized by the product of sizes.
+    Returns (index per row, list of per-dimension code arrays per combination).
+    """
+    index = np.zeros(len(codes[0]), dtype=np.int64)
+    for dimension_codes, size in zip(codes, sizes):
+        combined = index * size + np.asarray(dimension_codes, dtype=np.int64)
+        _, first, index = np.unique(combined, return_index=True, return_inverse=True)
+        index = index.reshape(-1)
+    return index, [np.asarray(dimension_codes)[first] for dimension_codes in codes]
@@ -0,0 +1,141 @@
+import argparse
+import importlib
+import sys
+import time
+
+# Only the standard library is imported up front; each subcommand imports what it needs
+START = time.perf_counter()
+
+
+class ImportTimer:
+    """Load modules on demand, recording how long each import took"""
+
+    def __init__(self):
+        self.imports = []
+
+    def load(self, name):
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        self.imports.append((name, time.perf_counter() - start))
+        return module
+
+    def print_summary(self, parsed_at, finished):
+        """Print argument parsing, per-module import and command time"""
+        imports = sum(seconds for _, seconds in self.imports)
+        print("\n" + "=" * 50)
+        print("STARTUP TIMING")
+        print("=" * 50)
+        print(f"{'Argument parsing':<32} {(parsed_at - START) * 1000:9.1f} ms")
+        for name, seconds in self.imports:
+            print(f"{'import ' + name:<32} {seconds * 1000:9.1f} ms")
+        print(f"{'Startup (parsing + imports)':<32} {(parsed_at - START + imports) * 1000:9.1f} ms")
+        print(f"{'Command':<32} {(finished - parsed_at - imports) * 1000:9.1f} ms")
+
+
+def run_ingest(args, modules):
+    config = modules.load('database_config').MYSQLConfig.from_env()
+    main = modules.load('main')
+    try:
+        main.ingest(config, rebuild=args.rebuild, csv_path=args.csv)
+    finally:
+        main.get_recorder().print_summary()
+        main.dispose_engines()
+
+
+def run_analyze(args, modules):
+    modules.load('ATM_analyze').main(
+        render_mode=args.render_mode, snapshot=args.snapshot, density_layer=args.density_layer,
+        kde_bandwidth_m=args.kde_bandwidth_m, use_cache=not args.no_cache,
+        ward_boundaries=args.ward_boundaries, zip_boundaries=args.zip_boundaries,
+        tiles_dir=args.tiles_dir, tiles_url=args.tiles_url, kde_cell_m=args.kde_cell_m)
+
+
+def run_map(args, modules):
+    visualize_atms = modules.load('visualize_atms')
+    if args.all:
+        visualize_atms.batch_main(out_dir=args.out_dir, workers=args.workers)
+    elif args.brand:
+        visualize_atms.brand_main(args.brand)
+    else:
+        visualize_atms.main()
+
+
+def run_list_brands(args, modules):
+    # The listing needs a connection and one GROUP BY: no folium, pyproj or scipy
+    engine_factory = modules.load('engine_factory')
+    sql_aggregates = modules.load('sql_aggregates')
+    try:
+        with engine_factory.connection(engine_factory.get_engine()) as conn:
+            df = sql_aggregates.brand_counts(conn)
+    finally:
+        engine_factory.dispose_engines()
+
+    for idx, (name, count) in enumerate(zip(df['NAME'], df['count'])):
+        print(f"{idx + 1:2d}. {name} ({count} locations)")
+
+
+def run_bench(args, modules):
+    modules.load('benchmark').main(args.bench_args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='atm_cli.py', description="ATM location analysis and density mapping")
+    parser.add_argument("--timing", action="store_true", help="report argument parsing, import and run time")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="load the CSV into MySQL (incremental sync unless --rebuild)")
+    ingest.add_argument("--csv", default="ATM_Banking.csv")
+    ingest.add_argument("--rebuild", action="store_true",
+                        help="drop and recreate ATM_DATA instead of syncing only the changed rows")
+    ingest.set_defaults(handler=run_ingest)
+
+    analyze = commands.add_parser('analyze', help="ward/ZIP density analysis and density map")
+    analyze.add_argument("--snapshot", help="read a columnar snapshot (see data_sources.py) instead of MySQL")
+    analyze.add_argument("--render-mode", choices=["markers", "cluster", "tiles"], default="markers")
+    analyze.add_argument("--density-layer", choices=["heatmap", "kde"], default="heatmap")
+    analyze.add_argument("--kde-bandwidth-m", type=float, default=None)
+    analyze.add_argument("--kde-cell-m", type=float, default=50,
+                         help="KDE grid cell size; coarsened automatically for very large areas")
+    analyze.add_argument("--no-cache", action="store_true", help="recompute even if the data is unchanged")
+    analyze.add_argument("--ward-boundaries", help="ward GeoJSON/shapefile to backfill and check WARD")
+    analyze.add_argument("--zip-boundaries", help="ZIP GeoJSON/shapefile to backfill and check ZIPCODE")
+    analyze.add_argument("--tiles-dir", help="with --render-mode tiles: write density tiles here for the map to fetch")
+    analyze.add_argument("--tiles-url", help="with --render-mode tiles: URL the tiles are served from "
+                                             "(default: --tiles-dir relative to the map)")
+    analyze.set_defaults(handler=run_analyze)
+
+    map_ = commands.add_parser('map', help="map one brand, every brand (--all), or choose interactively")
+    map_.add_argument("brand", nargs="?", help="brand NAME to map (see list-brands)")
+    map_.add_argument("--all", action="store_true", help="map every brand and write an index page")
+    map_.add_argument("--workers", type=int, default=None, help="worker processes for --all")
+    map_.add_argument("--out-dir", default=".", help="output directory for --all")
+    map_.set_defaults(handler=run_map)
+
+    list_brands = commands.add_parser('list-brands', help="list brands with their ATM counts")
+    list_brands.set_defaults(handler=run_list_brands)
+
+    # Options after 'bench' go to benchmark.py unchanged (try: bench --help)
+    bench = commands.add_parser('bench', add_help=False, help="per-stage benchmark on synthetic data")
+    bench.set_defaults(handler=run_bench)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'bench':
+        args.bench_args = extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    modules = ImportTimer()
+    parsed_at = time.perf_counter()
+    try:
+        return args.handler(args, modules)
+    finally:
+        if args.timing:
+            modules.print_summary(parsed_at, time.perf_counter())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
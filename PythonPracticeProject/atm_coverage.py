@@ -0,0 +1,209 @@
+import argparse
+import json
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from engine_factory import dispose_engines
+from grid import CoverageGrid
+from instrumentation import get_recorder, stage
+from spatial_index import ATMSpatialIndex
+
+# Query points per nearest-neighbor batch; bounds the working memory of a coverage run
+CHUNK_CELLS = 250000
+
+# Without ward boundaries, cells farther than this from every ATM are outside the study area
+AREA_KM = 1.0
+
+
+@dataclass
+class CoverageResult:
+    grid: CoverageGrid
+    distance_km: np.ndarray  # (n_rows, n_cols) float32, distance from each cell center to the nearest ATM
+    ward: np.ndarray  # (n_rows, n_cols) int16, ward polygon containing each cell (or of its nearest ATM); -1 outside the study area
+    threshold_km: float
+    name: object = None  # brand filter, if any
+
+    @property
+    def in_area(self):
+        return self.ward >= 0
+
+    @property
+    def gaps(self):
+        """Cells in the study area farther than threshold_km from an ATM"""
+        return self.in_area & (self.distance_km > self.threshold_km)
+
+
+def nearest_atm_grid(index, grid, name=None, area_km=AREA_KM, chunk_cells=CHUNK_CELLS, ward_layer=None):
+    """Distance to the nearest ATM (optionally of one brand) and ward for every grid cell
+
+    Cells are queried against the KD-tree in chunks of chunk_cells, so memory beyond the
+    two output arrays stays bounded however fine the grid is. With ward_layer (a
+    spatial_join.BoundaryLayer) a cell's ward is the ward polygon containing it and cells
+    outside every ward are outside the study area (ward -1). Without it, a cell's ward is
+    the ward of its nearest ATM of any brand and cells more than area_km from every ATM
+    are outside the study area, so the per-ward statistics depend on area_km.
+    """
+    distance_km = np.empty(grid.size, dtype=np.float32)
+    ward = np.empty(grid.size, dtype=np.int16)
+    wards = index.df['WARD'].to_numpy(dtype=np.int16)
+
+    for start in range(0, grid.size, chunk_cells):
+        stop = min(start + chunk_cells, grid.size)
+        latitudes, longitudes = grid.cell_centers(start, stop)
+
+        if ward_layer is not None:
+            ward[start:stop] = ward_layer.assign(latitudes, longitudes)
+            nearest = index.knn(latitudes, longitudes, k=1, name=name)[0][:, 0]
+        else:
+            nearest, positions = index.knn(latitudes, longitudes, k=1)
+            nearest, positions = nearest[:, 0], positions[:, 0]
+            ward[start:stop] = np.where(nearest <= area_km, wards[positions], -1)
+            if name is not None:
+                nearest = index.knn(latitudes, longitudes, k=1, name=name)[0][:, 0]
+        distance_km[start:stop] = nearest
+
+    return distance_km.reshape(grid.n_rows, grid.n_cols), ward.reshape(grid.n_rows, grid.n_cols)
+
+
+def analyze_coverage(df, cell_m=50, threshold_km=0.5, name=None, area_km=AREA_KM, chunk_cells=CHUNK_CELLS,
+                     boundaries=None):
+    """Coverage of the ATMs in df (latitude/longitude/WARD/NAME) on a cell_m grid
+
+    With ward boundaries (a spatial_join.Boundaries), the grid covers the ward polygons
+    and is clipped to them; otherwise it covers the ATMs plus an area_km buffer.
+    """
+    ward_layer = boundaries.wards if boundaries is not None else None
+    with stage('coverage', cell_m=cell_m, brand=name) as s:
+        index = ATMSpatialIndex(df)
+        if ward_layer is not None:
+            latitudes, longitudes = ward_layer.latlon_bounds()
+            grid = CoverageGrid.around(latitudes, longitudes, cell_m, margin_m=cell_m)
+        else:
+            grid = CoverageGrid.around(df['latitude'].values, df['longitude'].values, cell_m, margin_m=area_km * 1000)
+        distance_km, ward = nearest_atm_grid(index, grid, name=name, area_km=area_km, chunk_cells=chunk_cells,
+                                             ward_layer=ward_layer)
+        s.rows = grid.size
+    return CoverageResult(grid, distance_km, ward, threshold_km, name)
+
+
+def ward_coverage_stats(result):
+    """Per-ward nearest-ATM distance distribution and share of gap cells"""
+    in_area = result.in_area
+    cells = pd.DataFrame({
+        'WARD': result.ward[in_area],
+        'distance_km': result.distance_km[in_area],
+        'gap': result.gaps[in_area],
+    })
+    cell_km2 = (result.grid.cell_m / 1000) ** 2
+
+    stats = cells.groupby('WARD').agg(
+        cells=('distance_km', 'size'),
+        mean_km=('distance_km', 'mean'),
+        median_km=('distance_km', 'median'),
+        p90_km=('distance_km', lambda d: d.quantile(0.9)),
+        max_km=('distance_km', 'max'),
+        gap_cells=('gap', 'sum'),
+    ).reset_index()
+    stats['area_km2'] = stats['cells'] * cell_km2
+    stats['gap_km2'] = stats['gap_cells'] * cell_km2
+    stats['gap_share'] = stats['gap_cells'] / stats['cells']
+    return stats.sort_values('gap_share', ascending=False)
+
+
+def print_ward_coverage(stats, result):
+    """Print the per-ward coverage table"""
+    brand = f" ({result.name})" if result.name is not None else ""
+    print("\n" + "=" * 50)
+    print(f"ATM COVERAGE BY WARD{brand}")
+    print("=" * 50)
+    print(f"Grid: {result.grid.n_rows} x {result.grid.n_cols} cells of {result.grid.cell_m:g} m, "
+          f"gap threshold {result.threshold_km:g} km")
+    print(f"{'Ward':<6} {'Area km2':>9} {'Mean km':>8} {'Median km':>10} {'P90 km':>8} {'Max km':>8} "
+          f"{'Gap km2':>8} {'Gap %':>6}")
+    print("-" * 72)
+    for ward, area, mean, median, p90, farthest, gap_area, gap_share in zip(
+            stats['WARD'], stats['area_km2'], stats['mean_km'], stats['median_km'], stats['p90_km'],
+            stats['max_km'], stats['gap_km2'], stats['gap_share']):
+        print(f"{ward:<6} {area:9.2f} {mean:8.2f} {median:10.2f} {p90:8.2f} {farthest:8.2f} "
+              f"{gap_area:8.2f} {gap_share:6.1%}")
+
+
+def gap_features(result):
+    """GeoJSON features for gap cells, merging horizontal runs of gap cells into one rectangle"""
+    grid, gaps = result.grid, result.gaps
+    features = []
+    for row in np.flatnonzero(gaps.any(axis=1)):
+        # Run boundaries of consecutive gap cells in this row
+        edges = np.diff(np.concatenate(([0], gaps[row].astype(np.int8), [0])))
+        starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        south, north = grid.south + row * grid.dlat, grid.south + (row + 1) * grid.dlat
+
+        for start, stop in zip(starts, stops):
+            west, east = grid.west + start * grid.dlon, grid.west + stop * grid.dlon
+            run = result.distance_km[row, start:stop]
+            features.append({
+                'type': 'Feature',
+                'geometry': {'type': 'Polygon', 'coordinates': [[
+                    [west, south], [east, south], [east, north], [west, north], [west, south]]]},
+                'properties': {
+                    'ward': int(np.bincount(result.ward[row, start:stop]).argmax()),
+                    'cells': int(stop - start),
+                    'max_distance_km': round(float(run.max()), 3),
+                    'mean_distance_km': round(float(run.mean()), 3),
+                },
+            })
+    return features
+
+
+def write_gaps_geojson(result, path):
+    """Write gap cells above the threshold as a GeoJSON FeatureCollection"""
+    features = gap_features(result)
+    collection = {
+        'type': 'FeatureCollection',
+        'properties': {'threshold_km': result.threshold_km, 'cell_m': result.grid.cell_m, 'brand': result.name},
+        'features': features,
+    }
+    with open(path, 'w') as file:
+        json.dump(collection, file, separators=(',', ':'))
+    print(f"\n{int(result.gaps.sum())} gap cells ({len(features)} polygons) written to '{path}'")
+
+
+def main():
+    # Imported here so the analyzer can use this module without a circular import
+    from ATM_analyze import ATMDensityAnalyzer
+    from data_sources import SnapshotSource
+    from spatial_join import Boundaries
+
+    parser = argparse.ArgumentParser(description="Distance-to-nearest-ATM coverage and service gaps")
+    parser.add_argument("--snapshot", help="read a columnar snapshot instead of MySQL")
+    parser.add_argument("--brand", help="coverage of a single brand (NAME) instead of all ATMs")
+    parser.add_argument("--cell-m", type=float, default=50, help="grid cell size in meters")
+    parser.add_argument("--threshold-km", type=float, default=0.5, help="gap threshold to the nearest ATM")
+    parser.add_argument("--area-km", type=float, default=AREA_KM,
+                        help="without --ward-boundaries, cells farther than this from every ATM are outside "
+                             "the study area (the per-ward statistics depend on it)")
+    parser.add_argument("--ward-boundaries", help="ward GeoJSON/shapefile: clip the grid to the wards and "
+                                                  "assign each cell the ward containing it")
+    parser.add_argument("--ward-key", help="ward number property of the boundary file")
+    parser.add_argument("--output", default="atm_coverage_gaps.geojson")
+    args = parser.parse_args()
+
+    try:
+        analyzer = ATMDensityAnalyzer(source=SnapshotSource(args.snapshot) if args.snapshot else None)
+        analyzer.load_data()
+        analyzer.convert_coordinates()
+
+        boundaries = Boundaries.from_files(args.ward_boundaries, ward_key=args.ward_key)
+        result = analyze_coverage(analyzer.df, cell_m=args.cell_m, threshold_km=args.threshold_km,
+                                  name=args.brand, area_km=args.area_km, boundaries=boundaries)
+        print_ward_coverage(ward_coverage_stats(result), result)
+        write_gaps_geojson(result, args.output)
+    finally:
+        get_recorder().print_summary()
+        dispose_engines()
+
+
+if __name__ == "__main__":
+    main()
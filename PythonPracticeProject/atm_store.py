@@ -0,0 +1,99 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# Compact dtype of every numeric column the analyses read
+COLUMN_DTYPES = {
+    'OBJECTID': np.int32,
+    'WARD': np.int16,
+    'ZIPCODE': np.int32,
+    'latitude': np.float64,
+    'longitude': np.float64,
+}
+
+
+@dataclass
+class ATMStore:
+    """Valid ATMs as contiguous NumPy columns instead of a frame of Python objects
+
+    NAME is interned: name_codes index the brands table, so each ATM costs one int32
+    rather than a string. Addresses are only used for popups, so they are not held per
+    ATM: rows maps every ATM back to its position in the loaded data, and the address
+    table is read through address_loader the first time addresses() is called.
+    """
+    columns: dict  # COLUMN_DTYPES name -> 1D array, one entry per ATM
+    name_codes: np.ndarray  # int32 index into brands
+    brands: np.ndarray  # object array of distinct NAME values, sorted
+    rows: np.ndarray  # int64 position of each ATM in the loaded data
+    address_loader: object = field(default=None, repr=False)  # callable() -> addresses of the loaded data
+    _addresses: np.ndarray = field(default=None, repr=False)
+
+    @classmethod
+    def from_frame(cls, df, valid=None, address_loader=None):
+        """Keep the valid rows of df (boolean mask, all rows by default) as compact columns
+
+        Only the numeric columns and brand codes of the valid rows are copied; other
+        schema columns are never materialized. Without address_loader, addresses come
+        from df's ADDRESS column, held by reference.
+        """
+        rows = np.flatnonzero(valid) if valid is not None else np.arange(len(df))
+        # .array keeps nullable WARD/ZIPCODE (snapshot sources) masked until the rows are taken
+        columns = {column: np.ascontiguousarray(df[column].array[rows].to_numpy(dtype=dtype))
+                   for column, dtype in COLUMN_DTYPES.items()}
+
+        names = df['NAME']
+        if isinstance(names.dtype, pd.CategoricalDtype) and names.cat.categories.is_monotonic_increasing:
+            codes, brands = names.cat.codes.to_numpy()[rows], names.cat.categories.to_numpy(dtype=object)
+        else:
+            codes, brands = pd.factorize(names.to_numpy()[rows], sort=True)
+            brands = np.asarray(brands, dtype=object)
+
+        if address_loader is None and 'ADDRESS' in df.columns:
+            addresses = df['ADDRESS'].to_numpy()
+
+            def address_loader():
+                return addresses
+        return cls(columns, codes.astype(np.int32), brands, rows, address_loader)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, column):
+        if column == 'NAME':
+            return self.names()
+        return self.columns[column]
+
+    @property
+    def nbytes(self):
+        """Resident bytes of the per-ATM arrays (the shared brands table excluded)"""
+        return sum(array.nbytes for array in self.columns.values()) + self.name_codes.nbytes + self.rows.nbytes
+
+    def names(self):
+        """NAME of every ATM as a Categorical over the interned brands"""
+        return pd.Categorical.from_codes(self.name_codes, categories=self.brands)
+
+    def addresses(self):
+        """ADDRESS of every ATM, loading the address table on first use"""
+        if self._addresses is None:
+            table = self.address_loader() if self.address_loader is not None else None
+            self._addresses = (np.asarray(table, dtype=object)[self.rows] if table is not None
+                               else np.full(len(self), '', dtype=object))
+        return self._addresses
+
+    def mask(self, name=None, ward=None, zipcode=None):
+        """Boolean mask of the ATMs matching every given filter (a value or a list of values)"""
+        mask = np.ones(len(self), dtype=bool)
+        if name is not None:
+            names = [name] if np.isscalar(name) else list(name)
+            mask &= np.isin(self.name_codes, np.flatnonzero(np.isin(self.brands, names)))
+        for column, value in (('WARD', ward), ('ZIPCODE', zipcode)):
+            if value is not None:
+                mask &= np.isin(self.columns[column], [value] if np.isscalar(value) else list(value))
+        return mask
+
+    def frame(self):
+        """The store as a DataFrame over the same arrays (no copy), for pandas-based analyses"""
+        df = pd.DataFrame(self.columns, copy=False)
+        df['NAME'] = self.names()
+        return df
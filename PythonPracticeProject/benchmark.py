@@ -0,0 +1,216 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from sqlalchemy import create_engine
+
+from ATM_analyze import ATMDensityAnalyzer
+from bulk_loader import bulk_load
+from distance_engine import pairwise_distance_stats
+from instrumentation import StageRecorder
+from schema_manager import read_schema_commands
+from synthetic_data import generate_atms
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+# Slowdowns below this many seconds are treated as noise when comparing with a baseline
+NOISE_FLOOR_SEC = 0.05
+
+
+@dataclass
+class StageResult:
+    rows: int  # synthetic table size
+    stage: str
+    seconds: float
+    cpu_seconds: float
+    peak_mb: float  # tracemalloc peak inside the stage, None when memory profiling is off
+    max_rss_mb: float  # process high-water mark after the stage, None where unavailable
+    items: int  # rows the stage actually processed
+
+
+def measure(results, rows, stage, func, trace_memory=True, verbose=False):
+    """Run one stage under a StageRecorder, keeping wall/CPU time and peak memory; func returns (value, items)"""
+    recorder = StageRecorder(trace_memory=trace_memory)
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output, recorder.stage(stage) as record:
+        value, record.rows = func()
+
+    peak = record.peak_traced_mb
+    results.append(StageResult(rows, stage, record.seconds, record.cpu_seconds, peak, record.max_rss_mb, record.rows))
+    memory = f"{peak:9.1f} MB" if peak is not None else "        - MB"
+    print(f"{rows:>9} {stage:<10} {record.seconds:9.3f}s {record.cpu_seconds:9.3f}s cpu {memory} "
+          f"{record.rows:>9} items")
+    return value
+
+
+def create_sqlite_backend(db_path):
+    """Empty SQLite stand-in for ATM_DATA, built from schema.sql"""
+    conn = sqlite3.connect(db_path)
+    for cmd in read_schema_commands():
+        conn.execute(cmd)
+    conn.commit()
+    return conn
+
+
+def benchmark_size(rows, workdir, results, render_mode='cluster', aggregation='sql',
+                   max_distance_rows=20000, seed=0, trace_memory=True, verbose=False):
+    """Run every pipeline stage on a synthetic table of the given size"""
+    csv_path = os.path.join(workdir, f"atm_{rows}.csv")
+    db_path = os.path.join(workdir, f"atm_{rows}.db")
+    generate_atms(rows, seed=seed).to_csv(csv_path, index=False)
+
+    def run(stage, func):
+        return measure(results, rows, stage, func, trace_memory, verbose)
+
+    def ingest():
+        conn = create_sqlite_backend(db_path)
+        try:
+            report = bulk_load(conn, csv_path)
+        finally:
+            conn.close()
+        return report, report.rows
+
+    run('ingest', ingest)
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    analyzer = ATMDensityAnalyzer(engine=engine, aggregation=aggregation)
+    try:
+        def load():
+            analyzer.load_data()
+            return None, len(analyzer.df)
+
+        def project():
+            # Drop the coordinates stored at ingest so the X/Y -> WGS84 path is measured
+            analyzer.df = analyzer.df.drop(columns=['latitude', 'longitude', 'coord_valid'])
+            analyzer.convert_coordinates()
+            return None, len(analyzer.df)
+
+        def aggregate():
+            ward_stats = analyzer.analyze_ward_density()
+            zip_stats = analyzer.analyze_zip_density()
+            analyzer.analyze_atm_types_by_area()
+            return (ward_stats, zip_stats), len(analyzer.df)
+
+        def render():
+            analyzer.create_density_heatmap(ward_stats, zip_stats, render_mode=render_mode)
+            return None, len(analyzer.df)
+
+        def distance():
+            # Largest brand, capped: the pairwise scan is quadratic in the brand size
+            store = analyzer.store
+            brand = store.brands[np.bincount(store.name_codes).argmax()]
+            atms = np.flatnonzero(store.mask(name=brand))[:max_distance_rows]
+            stats = pairwise_distance_stats(store['latitude'][atms], store['longitude'][atms])
+            return stats, len(atms)
+
+        run('load', load)
+        run('project', project)
+        ward_stats, zip_stats = run('aggregate', aggregate)
+        # create_density_heatmap writes into the working directory
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            run('render', render)
+        finally:
+            os.chdir(cwd)
+        run('distance', distance)
+    finally:
+        engine.dispose()
+        for path in (csv_path, db_path):
+            os.remove(path)
+
+
+def write_results(results, path, meta):
+    """Write stage results as JSON"""
+    with open(path, 'w') as file:
+        json.dump({'meta': meta, 'results': [asdict(result) for result in results]}, file, indent=2)
+    print(f"Benchmark results written to '{path}'")
+
+
+def compare_with_baseline(results, baseline_path, tolerance=0.25):
+    """Print per-stage ratios against a baseline file and return the regressed stages"""
+    with open(baseline_path) as file:
+        baseline = {(entry['rows'], entry['stage']): entry for entry in json.load(file)['results']}
+
+    print("\n" + "=" * 50)
+    print(f"COMPARISON WITH BASELINE ({baseline_path})")
+    print("=" * 50)
+    print(f"{'Rows':>9} {'Stage':<10} {'Baseline':>10} {'Current':>10} {'Ratio':>7}")
+    print("-" * 50)
+
+    regressions = []
+    for result in results:
+        entry = baseline.get((result.rows, result.stage))
+        if entry is None:
+            print(f"{result.rows:>9} {result.stage:<10} {'-':>10} {result.seconds:9.3f}s {'new':>7}")
+            continue
+
+        ratio = result.seconds / entry['seconds'] if entry['seconds'] > 0 else float('inf')
+        regressed = (ratio > 1 + tolerance and result.seconds - entry['seconds'] > NOISE_FLOOR_SEC)
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{result.rows:>9} {result.stage:<10} {entry['seconds']:9.3f}s {result.seconds:9.3f}s "
+              f"{ratio:6.2f}x{flag}")
+        if regressed:
+            regressions.append((result, entry))
+
+    print(f"\n{len(regressions)} stage(s) slower than baseline by more than {tolerance:.0%}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ATM pipeline on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="synthetic table sizes (rows)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="compare with this results file; exit 1 on regressions")
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging")
+    parser.add_argument("--render-mode", choices=["markers", "cluster", "tiles"], default="cluster")
+    parser.add_argument("--aggregation", choices=["sql", "pandas"], default="sql")
+    parser.add_argument("--max-distance-rows", type=int, default=20000,
+                        help="cap on the brand size fed to the pairwise distance stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (it slows allocation-heavy stages)")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    args = parser.parse_args(argv)
+
+    meta = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'render_mode': args.render_mode,
+        'aggregation': args.aggregation,
+        'max_distance_rows': args.max_distance_rows,
+        'memory_profiled': not args.no_memory,
+    }
+
+    results = []
+    print(f"{'Rows':>9} {'Stage':<10} {'Wall':>10} {'CPU':>14} {'Peak':>12} {'Items':>15}")
+    print("-" * 76)
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.sizes:
+            benchmark_size(rows, workdir, results, render_mode=args.render_mode, aggregation=args.aggregation,
+                           max_distance_rows=args.max_distance_rows, seed=args.seed,
+                           trace_memory=not args.no_memory, verbose=args.verbose)
+
+    write_results(results, args.output, meta)
+
+    if args.baseline and args.save_baseline:
+        write_results(results, args.baseline, meta)
+    elif args.baseline:
+        if compare_with_baseline(results, args.baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from projection import detect_source_crs, project_coordinates
+
+# Column order and dtypes mirror schema.sql
+CSV_DTYPES = {
+    'X': 'float64',
+    'Y': 'float64',
+    'NAME': 'string',
+    'ADDRESS': 'string',
+    'ZIPCODE': 'Int32',
+    'WARD': 'Int32',
+    'ID': 'Int32',
+    'MAR_ID': 'Int32',
+    'XCOORD': 'float64',
+    'YCOORD': 'float64',
+    'GIS_ID': 'string',
+    'CREATOR': 'string',
+    'CREATED': 'string',
+    'EDITOR': 'string',
+    'EDITED': 'string',
+    'GLOBALID': 'string',
+    'OBJECTID': 'int64',
+}
+TIMESTAMP_COLUMNS = ('CREATED', 'EDITED')
+TABLE_COLUMNS = list(CSV_DTYPES) + ['latitude', 'longitude', 'coord_valid', 'ROW_HASH', 'ROW_CHECKSUM']
+
+# DB-API paramstyle -> positional placeholder
+PLACEHOLDERS = {'qmark': '?', 'format': '%s', 'pyformat': '%s'}
+
+
+@dataclass
+class LoadReport:
+    rows: int
+    chunks: int
+    seconds: float
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds > 0 else float('inf')
+
+
+def read_csv_chunks(csv_path, chunksize=20000):
+    """Stream the ATM CSV in chunks with explicit schema dtypes"""
+    return pd.read_csv(csv_path, chunksize=chunksize, dtype=CSV_DTYPES, encoding='utf-8-sig')
+
+
+def placeholder_for(connection):
+    """Return the positional placeholder of the DB-API driver behind a connection
+
+    The connection class may live in a submodule (mysql.connector.connection), so the
+    dotted module path is walked up to the first module that defines paramstyle.
+    """
+    parts = type(connection).__module__.split('.')
+    for end in range(len(parts), 0, -1):
+        driver = sys.modules.get('.'.join(parts[:end]))
+        if hasattr(driver, 'paramstyle'):
+            return PLACEHOLDERS[driver.paramstyle]
+    raise ValueError(f"no DB-API paramstyle found for {type(connection).__module__}")
+
+
+def insert_statement(table, columns, placeholder):
+    """Build a parameterized INSERT for executemany"""
+    values = ", ".join([placeholder] * len(columns))
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values})"
+
+
+def row_hashes(chunk):
+    """Stable 64-bit content hash of the source columns of each row, as uint64"""
+    return pd.util.hash_pandas_object(chunk[list(CSV_DTYPES)], index=False).to_numpy(dtype=np.uint64)
+
+
+def prepare_frame(chunk, source_crs):
+    """Project coordinates, hash rows and normalize timestamps for a CSV chunk"""
+    chunk = project_coordinates(chunk, source_crs)
+    hashes = row_hashes(chunk)
+    chunk['ROW_HASH'] = [f"{value:016x}" for value in hashes]
+    # High 32 bits as an integer, so fingerprints can checksum rows with a plain SQL SUM
+    chunk['ROW_CHECKSUM'] = (hashes >> np.uint64(32)).astype(np.int64)
+    for column in TIMESTAMP_COLUMNS:
+        chunk[column] = pd.to_datetime(chunk[column], errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+    chunk['coord_valid'] = chunk['coord_valid'].astype('int8')
+    return chunk
+
+
+def to_parameters(frame, columns=TABLE_COLUMNS):
+    """Convert a prepared frame into DB-API parameter tuples"""
+    # Object dtype with None for missing values is what every driver accepts
+    values = frame[columns].astype(object)
+    values = values.where(values.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def prepare_chunk(chunk, source_crs):
+    """Project coordinates and convert a CSV chunk into DB-API parameter tuples"""
+    return to_parameters(prepare_frame(chunk, source_crs))
+
+
+def bulk_load(connection, csv_path, table='ATM_DATA', chunksize=20000, source_crs=None):
+    """Stream a CSV into table with one executemany per chunk and report throughput
+
+    mysql.connector rewrites executemany INSERTs into multi-row INSERT statements and
+    sqlite3 reuses one prepared statement, so each chunk is a single round of work.
+    The source CRS is verified on the first chunk and reused for the rest.
+    """
+    cursor = connection.cursor()
+    statement = insert_statement(table, TABLE_COLUMNS, placeholder_for(connection))
+
+    rows = chunks = 0
+    start = time.perf_counter()
+    try:
+        for chunk in read_csv_chunks(csv_path, chunksize):
+            if source_crs is None:
+                source_crs = detect_source_crs(chunk)
+                print(f"Verified source CRS for X/Y: {source_crs}")
+
+            cursor.executemany(statement, prepare_chunk(chunk, source_crs))
+            connection.commit()
+
+            rows += len(chunk)
+            chunks += 1
+            elapsed = time.perf_counter() - start
+            print(f"Loaded chunk {chunks}: {rows} rows ({rows / elapsed:,.0f} rows/sec)")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    report = LoadReport(rows, chunks, time.perf_counter() - start)
+    print(f"Bulk load complete: {report.rows} rows in {report.seconds:.2f}s "
+          f"({report.rows_per_sec:,.0f} rows/sec)")
+    return report
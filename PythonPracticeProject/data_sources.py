@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from bulk_loader import CSV_DTYPES
+from projection import project_coordinates
+
+# Columns the analyses use, with compact dtypes; GLOBALID/GIS_ID/CREATOR/... are dropped
+SNAPSHOT_DTYPES = {
+    'OBJECTID': 'int32',
+    'WARD': 'int16',
+    'ZIPCODE': 'int32',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'coord_valid': 'bool',
+}
+SNAPSHOT_META = 'snapshot.json'
+# WARD/ZIPCODE are kept even when NULL (a boundary join can backfill them); on disk a
+# missing key is stored as this sentinel, in memory as a nullable Int16/Int32 value
+KEY_COLUMNS = ('WARD', 'ZIPCODE')
+MISSING_KEY = -1
+
+
+def stored_column(df, column, dtype):
+    """df[column] as a plain array of dtype, missing WARD/ZIPCODE encoded as MISSING_KEY"""
+    if column in KEY_COLUMNS:
+        return df[column].to_numpy(dtype=dtype, na_value=MISSING_KEY)
+    return df[column].to_numpy().astype(dtype, copy=False)
+
+
+def nullable_keys(column, values):
+    """values as a nullable integer array, MISSING_KEY entries masked (no copy of values)"""
+    return pd.arrays.IntegerArray(values, values == MISSING_KEY) if column in KEY_COLUMNS else values
+
+
+def compact_frame(df):
+    """Keep the analysis columns with compact dtypes: categorical NAME, small-int WARD/ZIPCODE
+
+    Rows with a NULL WARD or ZIPCODE are kept; the analysis filters or backfills them.
+    """
+    compact = pd.DataFrame({column: nullable_keys(column, stored_column(df, column, dtype))
+                            for column, dtype in SNAPSHOT_DTYPES.items()})
+    compact['NAME'] = pd.Categorical(df['NAME'].to_numpy())
+    compact['ADDRESS'] = df['ADDRESS'].to_numpy(dtype=object)
+    return compact
+
+
+class MySQLSource:
+    """Rows from the ATM_DATA table through the shared pooled engine"""
+
+    def __init__(self, engine=None):
+        self.engine = engine
+
+    def load(self):
+        # Imported here so snapshot/CSV sources work on machines without a database
+        from engine_factory import connection, get_engine
+        from sql_aggregates import row_query
+
+        query = row_query(where="DELETED = 0")
+        with connection(self.engine or get_engine()) as conn:
+            return pd.read_sql(query, conn)
+
+    def version(self):
+        """Fingerprint of the table contents (see sql_aggregates.dataset_version)"""
+        from engine_factory import connection, get_engine
+        from sql_aggregates import dataset_version
+
+        with connection(self.engine or get_engine()) as conn:
+            return dataset_version(conn, where="DELETED = 0")
+
+
+def file_version(path):
+    """Fingerprint of a file or snapshot directory: path, size and modification time of its files"""
+    paths = [path] if os.path.isfile(path) else sorted(os.path.join(path, name) for name in os.listdir(path))
+    return tuple((name, os.path.getsize(name), os.path.getmtime(name)) for name in paths)
+
+
+class CSVSource:
+    """Rows straight from ATM_Banking.csv, projected to WGS84 in memory"""
+
+    def __init__(self, path='ATM_Banking.csv'):
+        self.path = path
+
+    def load(self):
+        df = pd.read_csv(self.path, dtype=CSV_DTYPES, encoding='utf-8-sig')
+        return compact_frame(project_coordinates(df))
+
+    def version(self):
+        return file_version(self.path)
+
+
+class SnapshotSource:
+    """Columnar snapshot written by write_snapshot
+
+    A directory snapshot holds one .npy file per column and is opened memory-mapped, so
+    loading costs milliseconds and pages are only read when touched. A *.parquet path is
+    read with pandas (requires pyarrow).
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if self.path.endswith('.parquet'):
+            return pd.read_parquet(self.path)
+
+        with open(os.path.join(self.path, SNAPSHOT_META)) as file:
+            meta = json.load(file)
+
+        columns = {column: nullable_keys(column, np.load(os.path.join(self.path, f"{column}.npy"), mmap_mode='r'))
+                   for column in SNAPSHOT_DTYPES}
+        columns['NAME'] = pd.Categorical.from_codes(
+            np.load(os.path.join(self.path, 'NAME.codes.npy'), mmap_mode='r'), meta['name_categories'])
+        columns['ADDRESS'] = np.char.decode(np.load(os.path.join(self.path, 'ADDRESS.npy'), mmap_mode='r'), 'utf-8')
+        return pd.DataFrame(columns, copy=False)
+
+    def version(self):
+        return file_version(self.path)
+
+
+def write_snapshot(df, path):
+    """Write the analysis columns of df as a columnar snapshot (directory of .npy, or .parquet)"""
+    df = df if isinstance(df['NAME'].dtype, pd.CategoricalDtype) else compact_frame(df)
+
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        os.makedirs(path, exist_ok=True)
+        for column, dtype in SNAPSHOT_DTYPES.items():
+            np.save(os.path.join(path, f"{column}.npy"), stored_column(df, column, dtype))
+        np.save(os.path.join(path, 'NAME.codes.npy'), df['NAME'].cat.codes.to_numpy())
+        np.save(os.path.join(path, 'ADDRESS.npy'), np.char.encode(df['ADDRESS'].to_numpy().astype(str), 'utf-8'))
+        with open(os.path.join(path, SNAPSHOT_META), 'w') as file:
+            json.dump({'rows': len(df), 'name_categories': df['NAME'].cat.categories.tolist()}, file)
+
+    print(f"Snapshot of {len(df)} ATMs written to '{path}'")
+
+
+def main():
+    """Build a columnar snapshot from the CSV or the database"""
+    parser = argparse.ArgumentParser(description="Write an offline columnar snapshot of the ATM data")
+    parser.add_argument("output", help="snapshot directory (memory-mapped .npy) or *.parquet file")
+    parser.add_argument("--csv", help="build from this CSV instead of the ATM_DATA table")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    source = CSVSource(args.csv) if args.csv else MySQLSource()
+    write_snapshot(source.load(), args.output)
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
+import os
 from dataclasses import dataclass
 
 
+def _env_bool(value):
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
 @dataclass
 class MYSQLConfig():
     host: str = 'localhost'
@@ -9,3 +14,35 @@ class MYSQLConfig():
     password: str = '123'
     table: str = 'ATM_DATA'  # Updated to match the table name
     database: str = 'ATM_DATA'  # Added for database name
+
+    @classmethod
+    def from_env(cls):
+        """Build the config from ATM_DB_* environment variables, falling back to the defaults"""
+        return cls(
+            host=os.environ.get('ATM_DB_HOST', cls.host),
+            port=int(os.environ.get('ATM_DB_PORT', cls.port)),
+            user=os.environ.get('ATM_DB_USER', cls.user),
+            password=os.environ.get('ATM_DB_PASSWORD', cls.password),
+            table=os.environ.get('ATM_DB_TABLE', cls.table),
+            database=os.environ.get('ATM_DB_NAME', cls.database),
+        )
+
+
+@dataclass
+class PoolConfig():
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: int = 30
+    pool_recycle: int = 1800  # seconds; stay under MySQL's wait_timeout
+    pool_pre_ping: bool = True
+
+    @classmethod
+    def from_env(cls):
+        """Build pool settings from ATM_DB_POOL_* environment variables, falling back to the defaults"""
+        return cls(
+            pool_size=int(os.environ.get('ATM_DB_POOL_SIZE', cls.pool_size)),
+            max_overflow=int(os.environ.get('ATM_DB_POOL_MAX_OVERFLOW', cls.max_overflow)),
+            pool_timeout=int(os.environ.get('ATM_DB_POOL_TIMEOUT', cls.pool_timeout)),
+            pool_recycle=int(os.environ.get('ATM_DB_POOL_RECYCLE', cls.pool_recycle)),
+            pool_pre_ping=_env_bool(os.environ.get('ATM_DB_POOL_PRE_PING', str(cls.pool_pre_ping))),
+        )
@@ -0,0 +1,121 @@
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from bulk_loader import TABLE_COLUMNS, insert_statement, placeholder_for, prepare_frame, read_csv_chunks, to_parameters
+from projection import detect_source_crs
+
+KEY_COLUMN = 'OBJECTID'
+
+
+@dataclass
+class SyncReport:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+
+    @property
+    def changed(self):
+        return self.inserted + self.updated + self.deleted
+
+
+def upsert_statement(table, columns, connection):
+    """Build an INSERT that updates the existing row on an OBJECTID collision"""
+    placeholder = placeholder_for(connection)
+    insert = insert_statement(table, columns, placeholder)
+    updates = [column for column in columns if column != KEY_COLUMN] + ['DELETED']
+
+    if placeholder == '?':
+        # SQLite stand-in
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in updates[:-1])
+        return f"{insert} ON CONFLICT({KEY_COLUMN}) DO UPDATE SET {assignments}, DELETED = 0"
+
+    assignments = ", ".join(f"{column} = VALUES({column})" for column in updates[:-1])
+    return f"{insert} ON DUPLICATE KEY UPDATE {assignments}, DELETED = 0"
+
+
+def fetch_sync_state(connection, table='ATM_DATA'):
+    """Load the per-row sync keys (OBJECTID, GLOBALID, EDITED, ROW_HASH, DELETED) of the table"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT OBJECTID, GLOBALID, EDITED, ROW_HASH, DELETED FROM {table}")
+        state = pd.DataFrame(cursor.fetchall(), columns=['OBJECTID', 'GLOBALID', 'EDITED', 'ROW_HASH', 'DELETED'])
+    finally:
+        cursor.close()
+
+    return state.set_index(KEY_COLUMN)
+
+
+def _as_text(series):
+    """Compare keys as plain text: MySQL returns datetimes where SQLite and the CSV give strings"""
+    return series.astype(object).where(series.notna(), '').astype(str).to_numpy(dtype=object)
+
+
+def classify_rows(frame, state):
+    """Split a prepared chunk into new and changed rows against the stored sync state"""
+    stored = state.reindex(frame[KEY_COLUMN].values)
+    is_new = ~np.isin(frame[KEY_COLUMN].values, state.index.values)
+
+    is_changed = ~is_new & (
+        (_as_text(stored['GLOBALID']) != _as_text(frame['GLOBALID'])) |
+        (_as_text(stored['EDITED']) != _as_text(frame['EDITED'])) |
+        (_as_text(stored['ROW_HASH']) != _as_text(frame['ROW_HASH'])) |
+        (stored['DELETED'].fillna(0).values == 1)
+    )
+    return is_new, is_changed
+
+
+def sync_csv(connection, csv_path, table='ATM_DATA', chunksize=20000, source_crs=None):
+    """Incrementally sync a CSV into table
+
+    Rows are keyed on OBJECTID; a row is rewritten only when it is new or its GLOBALID,
+    EDITED timestamp or content hash changed. Rows missing from the CSV are tombstoned
+    with DELETED = 1 rather than removed, so readers never see an empty table.
+    """
+    start = time.perf_counter()
+    report = SyncReport()
+    state = fetch_sync_state(connection, table)
+    seen = []
+
+    statement = upsert_statement(table, TABLE_COLUMNS, connection)
+    placeholder = placeholder_for(connection)
+    cursor = connection.cursor()
+    try:
+        for chunk in read_csv_chunks(csv_path, chunksize):
+            if source_crs is None:
+                source_crs = detect_source_crs(chunk)
+                print(f"Verified source CRS for X/Y: {source_crs}")
+
+            frame = prepare_frame(chunk, source_crs)
+            seen.append(frame[KEY_COLUMN].values)
+
+            is_new, is_changed = classify_rows(frame, state)
+            if (is_new | is_changed).any():
+                cursor.executemany(statement, to_parameters(frame[is_new | is_changed]))
+            report.inserted += int(is_new.sum())
+            report.updated += int(is_changed.sum())
+            report.unchanged += int(len(frame) - is_new.sum() - is_changed.sum())
+
+        # Tombstone rows that disappeared from the source
+        live = state.index[state['DELETED'] == 0]
+        removed = live.difference(np.concatenate(seen) if seen else [])
+        if len(removed):
+            cursor.executemany(f"UPDATE {table} SET DELETED = 1 WHERE {KEY_COLUMN} = {placeholder}",
+                               [(int(key),) for key in removed])
+        report.deleted = len(removed)
+
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    report.seconds = time.perf_counter() - start
+    print(f"Delta sync complete in {report.seconds:.2f}s: {report.inserted} inserted, {report.updated} updated, "
+          f"{report.deleted} tombstoned, {report.unchanged} unchanged")
+    return report
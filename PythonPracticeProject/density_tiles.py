@@ -0,0 +1,179 @@
+import json
+import os
+
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+
+# Zoom levels precomputed by default (city to street scale)
+DEFAULT_ZOOM_LEVELS = tuple(range(9, 17))
+
+# Zoom levels embedded in the page when tiles are not served: cells at zoom 13 are about
+# 500 m wide, so the embedded payload is bounded by area rather than by the ATM count
+EMBEDDED_ZOOM_LEVELS = tuple(range(9, 14))
+
+# Each 256px map tile is split into 2**CELL_DEPTH x 2**CELL_DEPTH cells (32px cells for depth 3)
+CELL_DEPTH = 3
+
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def world_tile_coordinates(latitudes, longitudes, level):
+    """Fractional Web Mercator tile coordinates of lat/lon at a quadtree level"""
+    lat = np.radians(np.clip(np.asarray(latitudes, dtype=np.float64), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    lon = np.asarray(longitudes, dtype=np.float64)
+    n = 2.0 ** level
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n
+    return np.clip(x, 0, n - 1), np.clip(y, 0, n - 1)
+
+
+def quadkey(x, y, level):
+    """Bing-style quadkey of integer tile (x, y) at a level"""
+    digits = []
+    for bit in range(level - 1, -1, -1):
+        mask = 1 << bit
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return ''.join(digits)
+
+
+def build_density_tiles(latitudes, longitudes, zoom_levels=DEFAULT_ZOOM_LEVELS, cell_depth=CELL_DEPTH):
+    """Bin ATMs into a quadtree grid at every zoom level
+
+    Returns {zoom: {tile_quadkey: [[cell_x, cell_y, count], ...]}}, where cell_x/cell_y are
+    integer cell coordinates at level zoom + cell_depth. Each zoom level is one
+    np.unique over integer cell keys, so cost is linear in the number of ATMs and the
+    output size depends only on the number of occupied cells.
+    """
+    tiles = {}
+    for zoom in zoom_levels:
+        level = zoom + cell_depth
+        x, y = world_tile_coordinates(latitudes, longitudes, level)
+        cell_x, cell_y = x.astype(np.int64), y.astype(np.int64)
+
+        keys, counts = np.unique(cell_x * (1 << level) + cell_y, return_counts=True)
+        cell_x, cell_y = keys >> level, keys & ((1 << level) - 1)
+
+        # Group cells by their parent map tile; keys are sorted, so sort by tile and split
+        tile_keys = (cell_x >> cell_depth) * (1 << zoom) + (cell_y >> cell_depth)
+        order = np.argsort(tile_keys, kind='stable')
+        tile_keys, cells = tile_keys[order], np.column_stack((cell_x, cell_y, counts))[order]
+        boundaries = np.flatnonzero(np.diff(tile_keys)) + 1
+
+        level_tiles = {}
+        for tile_key, tile_cells in zip(tile_keys[np.r_[0, boundaries]] if len(tile_keys) else [],
+                                        np.split(cells, boundaries)):
+            level_tiles[quadkey(int(tile_key >> zoom), int(tile_key & ((1 << zoom) - 1)), zoom)] = tile_cells.tolist()
+        tiles[zoom] = level_tiles
+    return tiles
+
+
+def tile_index(tiles, cell_depth=CELL_DEPTH):
+    """Small per-zoom index (available tiles, max cell count) the map reads first"""
+    levels = {}
+    for zoom, level_tiles in tiles.items():
+        max_count = max((cell[2] for cells in level_tiles.values() for cell in cells), default=0)
+        levels[str(zoom)] = {'max': max_count, 'tiles': sorted(level_tiles)}
+    return {'cell_depth': cell_depth, 'levels': levels}
+
+
+def write_density_tiles(tiles, out_dir, cell_depth=CELL_DEPTH):
+    """Write index.json plus one compact JSON file per tile: out_dir/<zoom>/<quadkey>.json"""
+    for zoom, level_tiles in tiles.items():
+        zoom_dir = os.path.join(out_dir, str(zoom))
+        os.makedirs(zoom_dir, exist_ok=True)
+        for key, cells in level_tiles.items():
+            with open(os.path.join(zoom_dir, f"{key}.json"), 'w') as file:
+                json.dump(cells, file, separators=(',', ':'))
+
+    with open(os.path.join(out_dir, 'index.json'), 'w') as file:
+        json.dump(tile_index(tiles, cell_depth), file, separators=(',', ':'))
+    print(f"Density tiles written to '{out_dir}' ({sum(len(t) for t in tiles.values())} tiles)")
+
+
+class DensityTileLayer(MacroElement):
+    """Leaflet layer drawing precomputed density cells for the tiles in the current viewport
+
+    With tiles_url the layer fetches <tiles_url>/<zoom>/<quadkey>.json on demand (serve
+    the directory over HTTP); otherwise the aggregated tiles are embedded in the page.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function () {
+            var map = {{ this._parent.get_name() }};
+            var index = {{ this.index }};
+            var embedded = {{ this.embedded }};
+            var baseUrl = {{ this.tiles_url }};
+            var layer = L.layerGroup().addTo(map);
+            var cache = {};
+            var zooms = Object.keys(index.levels).map(Number);
+            var minZoom = Math.min.apply(null, zooms), maxZoom = Math.max.apply(null, zooms);
+
+            function tileLat(y, n) {
+                var t = Math.PI - 2 * Math.PI * y / n;
+                return 180 / Math.PI * Math.atan(0.5 * (Math.exp(t) - Math.exp(-t)));
+            }
+            function tileLon(x, n) { return x / n * 360 - 180; }
+            function quadkey(x, y, z) {
+                var key = '';
+                for (var i = z; i > 0; i--) {
+                    var mask = 1 << (i - 1), digit = 0;
+                    if (x & mask) digit += 1;
+                    if (y & mask) digit += 2;
+                    key += digit;
+                }
+                return key;
+            }
+            function load(z, key, done) {
+                var id = z + '/' + key;
+                if (cache[id]) return done(cache[id]);
+                if (embedded) return done(cache[id] = embedded[z][key] || []);
+                fetch(baseUrl + '/' + id + '.json')
+                    .then(function (r) { return r.ok ? r.json() : []; })
+                    .then(function (cells) { done(cache[id] = cells); });
+            }
+            function redraw() {
+                layer.clearLayers();
+                var z = Math.max(minZoom, Math.min(maxZoom, map.getZoom()));
+                var level = index.levels[z], n = Math.pow(2, z), cellN = Math.pow(2, z + index.cell_depth);
+                var available = {};
+                level.tiles.forEach(function (key) { available[key] = true; });
+                var b = map.getBounds();
+                var x0 = Math.floor((b.getWest() + 180) / 360 * n), x1 = Math.floor((b.getEast() + 180) / 360 * n);
+                var y0 = Math.floor((1 - Math.log(Math.tan(b.getNorth() * Math.PI / 180) +
+                                    1 / Math.cos(b.getNorth() * Math.PI / 180)) / Math.PI) / 2 * n);
+                var y1 = Math.floor((1 - Math.log(Math.tan(b.getSouth() * Math.PI / 180) +
+                                    1 / Math.cos(b.getSouth() * Math.PI / 180)) / Math.PI) / 2 * n);
+                for (var x = Math.max(0, x0); x <= Math.min(n - 1, x1); x++) {
+                    for (var y = Math.max(0, y0); y <= Math.min(n - 1, y1); y++) {
+                        var key = quadkey(x, y, z);
+                        if (!available[key]) continue;
+                        load(z, key, function (cells) {
+                            cells.forEach(function (c) {
+                                var ratio = Math.sqrt(c[2] / level.max);
+                                L.rectangle([[tileLat(c[1] + 1, cellN), tileLon(c[0], cellN)],
+                                             [tileLat(c[1], cellN), tileLon(c[0] + 1, cellN)]], {
+                                    stroke: false, fillOpacity: 0.25 + 0.5 * ratio,
+                                    fillColor: 'hsl(' + Math.round(120 * (1 - ratio)) + ',90%,45%)'
+                                }).bindTooltip(c[2] + ' ATMs').addTo(layer);
+                            });
+                        });
+                    }
+                }
+            }
+            map.on('moveend', redraw);
+            redraw();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, tiles, tiles_url=None, cell_depth=CELL_DEPTH):
+        super().__init__()
+        self._name = 'DensityTileLayer'
+        self.index = json.dumps(tile_index(tiles, cell_depth), separators=(',', ':'))
+        self.tiles_url = json.dumps(tiles_url)
+        if tiles_url is None:
+            self.embedded = json.dumps({str(z): t for z, t in tiles.items()}, separators=(',', ':'))
+        else:
+            self.embedded = 'null'
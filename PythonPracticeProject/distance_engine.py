@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# Same mean earth radius as geopy.distance.great_circle, so results match the old loop
+EARTH_RADIUS_KM = 6371.009
+KM_TO_MILES = 0.621371
+
+
+@dataclass
+class DistanceStats:
+    count: int
+    shortest: float
+    farthest: float
+    average: float
+    nearest: np.ndarray  # nearest-neighbor distance (km) for each ATM
+
+
+def _unit_trig(latitudes, longitudes):
+    """Precompute per-point sines/cosines so each pair costs no trigonometric calls"""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return np.sin(lat), np.cos(lat), np.sin(lon), np.cos(lon)
+
+
+def _block_km(trig, rows, cols):
+    """Great-circle distances (km) between the rows slice and the cols slice of precomputed trig"""
+    sin_lat, cos_lat, sin_lon, cos_lon = trig
+    s1, c1 = sin_lat[rows, None], cos_lat[rows, None]
+    s2, c2 = sin_lat[None, cols], cos_lat[None, cols]
+    # cos/sin of the longitude difference via angle-difference identities
+    cos_delta = cos_lon[rows, None] * cos_lon[None, cols] + sin_lon[rows, None] * sin_lon[None, cols]
+    sin_delta = sin_lon[None, cols] * cos_lon[rows, None] - cos_lon[None, cols] * sin_lon[rows, None]
+
+    # Haversine-equivalent atan2 form (the one geopy uses), stable for tiny and antipodal distances
+    numerator = np.hypot(c2 * sin_delta, c1 * s2 - s1 * c2 * cos_delta)
+    denominator = s1 * s2 + c1 * c2 * cos_delta
+    return EARTH_RADIUS_KM * np.arctan2(numerator, denominator)
+
+
+def pairwise_distance_stats(latitudes, longitudes, block_size=256):
+    """Compute shortest/farthest/average pairwise distance and nearest neighbors in square tiles
+
+    Rows and columns are both cut into block_size blocks and only tiles on or above the
+    diagonal are evaluated, so every unordered pair is seen exactly once and at most a
+    block_size x block_size array is in memory at a time, whatever the number of ATMs.
+    Running min/max/sum/count accumulators replace the old list of all pairs.
+    """
+    trig = _unit_trig(latitudes, longitudes)
+    n = len(trig[0])
+
+    nearest = np.full(n, np.inf)
+    shortest, farthest, total, count = np.inf, -np.inf, 0.0, 0
+
+    for row_start in range(0, n, block_size):
+        row_stop = min(row_start + block_size, n)
+        size = row_stop - row_start
+        upper = np.triu_indices(size, k=1)
+
+        for col_start in range(row_start, n, block_size):
+            col_stop = min(col_start + block_size, n)
+            tile = _block_km(trig, slice(row_start, row_stop), slice(col_start, col_stop))
+
+            # A diagonal tile holds each pair twice plus the zero self-distances: keep its upper triangle
+            pairs = tile[upper] if col_start == row_start else tile
+            if pairs.size:
+                shortest = min(shortest, pairs.min())
+                farthest = max(farthest, pairs.max())
+                total += pairs.sum()
+                count += pairs.size
+
+            # Nearest neighbor: the tile is one half of a symmetric matrix, so update rows and columns
+            if col_start == row_start:
+                tile[np.arange(size), np.arange(size)] = np.inf
+            nearest[row_start:row_stop] = np.minimum(nearest[row_start:row_stop], tile.min(axis=1))
+            nearest[col_start:col_stop] = np.minimum(nearest[col_start:col_stop], tile.min(axis=0))
+
+    if count == 0:
+        return DistanceStats(0, float('nan'), float('nan'), float('nan'), nearest)
+
+    return DistanceStats(count, float(shortest), float(farthest), total / count, nearest)
+
+
+def print_distance_stats(stats):
+    """Print distance statistics in the interactive mapper's format"""
+    print(f"\nDistance Statistics:")
+    print(f"Shortest distance between ATMs: {stats.shortest:.2f} km ({stats.shortest * KM_TO_MILES:.2f} miles)")
+    print(f"Farthest distance between ATMs: {stats.farthest:.2f} km ({stats.farthest * KM_TO_MILES:.2f} miles)")
+    print(f"Average distance between ATMs: {stats.average:.2f} km ({stats.average * KM_TO_MILES:.2f} miles)")
+    print(f"Median nearest-neighbor distance: {np.median(stats.nearest):.2f} km "
+          f"({np.median(stats.nearest) * KM_TO_MILES:.2f} miles)")
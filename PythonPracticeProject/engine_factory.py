@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+from sqlalchemy import create_engine
+
+from database_config import MYSQLConfig, PoolConfig
+
+_engines = {}
+_lock = threading.Lock()
+
+
+class CheckoutMetrics:
+    """Rolling record of pool checkout latencies (seconds)"""
+
+    def __init__(self, maxlen=10000):
+        self.samples = deque(maxlen=maxlen)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        """Checkout count and p50/p99/max latency in milliseconds"""
+        if not self.samples:
+            return {'checkouts': self.count, 'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+        samples = np.array(self.samples) * 1000
+        return {
+            'checkouts': self.count,
+            'p50_ms': float(np.percentile(samples, 50)),
+            'p99_ms': float(np.percentile(samples, 99)),
+            'max_ms': float(samples.max()),
+        }
+
+
+checkout_metrics = CheckoutMetrics()
+
+
+def database_url(config=None):
+    """SQLAlchemy URL for ATM_DATA; ATM_DB_URL overrides it (e.g. sqlite:///atm.db for a local stand-in)"""
+    if os.environ.get('ATM_DB_URL'):
+        return os.environ['ATM_DB_URL']
+    config = config or MYSQLConfig.from_env()
+    return f"mysql+mysqlconnector://{config.user}:{config.password}@{config.host}:{config.port}/{config.database}"
+
+
+def get_engine(config=None, pool_config=None):
+    """Return the process-wide pooled engine for a database URL, creating it on first use"""
+    url = database_url(config)
+    with _lock:
+        if url not in _engines:
+            pool_config = pool_config or PoolConfig.from_env()
+            options = {'pool_pre_ping': pool_config.pool_pre_ping, 'pool_recycle': pool_config.pool_recycle}
+            if not url.startswith('sqlite'):
+                options.update(pool_size=pool_config.pool_size, max_overflow=pool_config.max_overflow,
+                               pool_timeout=pool_config.pool_timeout)
+            _engines[url] = create_engine(url, **options)
+        return _engines[url]
+
+
+@contextmanager
+def connection(engine=None):
+    """Check a connection out of the shared pool, recording how long the checkout took"""
+    engine = engine or get_engine()
+    start = time.perf_counter()
+    conn = engine.connect()
+    checkout_metrics.record(time.perf_counter() - start)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def print_checkout_metrics():
+    """Print pool checkout latency collected so far"""
+    summary = checkout_metrics.summary()
+    if summary['checkouts']:
+        print(f"Pool checkouts: {summary['checkouts']} "
+              f"(p50 {summary['p50_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms, max {summary['max_ms']:.2f} ms)")
+
+
+def admin_connection(config=None):
+    """Server-level MYSQLConnect (no database selected) for DDL and bulk loads, from the same config"""
+    # mysql.connector is only imported by callers that actually talk to the server
+    from database_connect import MYSQLConnect
+
+    config = config or MYSQLConfig.from_env()
+    return MYSQLConnect(config.host, config.port, config.user, config.password)
+
+
+def dispose_engines():
+    """Close every pooled connection; call once when the process is done with the database"""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
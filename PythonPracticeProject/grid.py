@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from distance_engine import EARTH_RADIUS_KM
+
+
+@dataclass
+class CoverageGrid:
+    """Regular lat/lon grid of roughly square cells; row 0 is the southernmost"""
+    south: float
+    west: float
+    dlat: float
+    dlon: float
+    n_rows: int
+    n_cols: int
+    cell_m: float
+
+    @classmethod
+    def around(cls, latitudes, longitudes, cell_m=50, margin_m=500):
+        """Grid covering the bounding box of the points plus a margin"""
+        dlat = np.degrees(cell_m / (EARTH_RADIUS_KM * 1000))
+        dlon = dlat / np.cos(np.radians(np.mean(latitudes)))
+        margin_lat, margin_lon = dlat * margin_m / cell_m, dlon * margin_m / cell_m
+        south, west = np.min(latitudes) - margin_lat, np.min(longitudes) - margin_lon
+        n_rows = int(np.ceil((np.max(latitudes) + margin_lat - south) / dlat))
+        n_cols = int(np.ceil((np.max(longitudes) + margin_lon - west) / dlon))
+        return cls(float(south), float(west), float(dlat), float(dlon), n_rows, n_cols, cell_m)
+
+    @property
+    def size(self):
+        return self.n_rows * self.n_cols
+
+    def cell_centers(self, start, stop):
+        """Latitude/longitude of the centers of flat cell indices [start, stop)"""
+        cells = np.arange(start, stop)
+        rows, cols = np.divmod(cells, self.n_cols)
+        return self.south + (rows + 0.5) * self.dlat, self.west + (cols + 0.5) * self.dlon
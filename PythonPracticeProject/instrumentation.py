@@ -0,0 +1,234 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage; see max_rss_mb
+    resource = None
+
+
+@dataclass
+class StageRecord:
+    stage: str  # dotted path, e.g. 'run_analysis.load'
+    labels: dict = field(default_factory=dict)
+    rows: int = None  # set by the caller inside the stage
+    seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    max_rss_mb: float = None  # process high-water mark when the stage ended, None if unavailable
+    rss_growth_mb: float = None  # how much this stage raised the high-water mark
+    peak_traced_mb: float = None  # tracemalloc peak inside the stage, when memory tracing is on
+    started_at: float = 0.0  # epoch seconds
+
+
+def max_rss_mb():
+    """Process peak resident set size in MB, or None where it can't be measured
+
+    ru_maxrss is KB on Linux and bytes on macOS. Windows has no resource module; there
+    the peak working set is read through psutil when it is installed.
+    """
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    return peak / (1024 * 1024) if peak is not None else None
+
+
+class _Stage:
+    """Context manager timing one stage of a StageRecorder"""
+
+    def __init__(self, recorder, name, labels):
+        self.recorder = recorder
+        self.record = StageRecord(name, labels)
+
+    def __enter__(self):
+        self.record.stage = self.recorder._push(self.record.stage)
+        self.record.started_at = time.time()
+        self._rss = max_rss_mb()
+        self._cpu = time.process_time()
+        self._start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc):
+        record = self.record
+        record.seconds = time.perf_counter() - self._start
+        record.cpu_seconds = time.process_time() - self._cpu
+        record.max_rss_mb = max_rss_mb()
+        if record.max_rss_mb is not None:
+            record.rss_growth_mb = record.max_rss_mb - self._rss
+        record.peak_traced_mb = self.recorder._pop()
+        self.recorder._emit(record)
+        return False
+
+
+class StageRecorder:
+    """Records wall time, CPU time, memory and row counts for nested pipeline stages
+
+    Each finished stage is appended to .records and passed to sink (any callable, e.g.
+    json_lines_sink or a metrics client). trace_memory turns on tracemalloc, which gives
+    exact per-stage Python allocation peaks but slows allocation-heavy code.
+    """
+
+    enabled = True
+
+    def __init__(self, sink=None, trace_memory=False):
+        self.sink = sink
+        self.trace_memory = trace_memory
+        self.records = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owns_tracing = False
+
+    def stage(self, name, **labels):
+        """Context manager for one stage; set .rows on the yielded record to report row counts"""
+        return _Stage(self, name, labels)
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _push(self, name):
+        stack = self._stack()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracing = True
+            # Fold the peak so far into the parent before resetting it for this stage
+            if stack:
+                stack[-1][1] = max(stack[-1][1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        path = f"{stack[-1][0]}.{name}" if stack else name
+        stack.append([path, 0])
+        return path
+
+    def _pop(self):
+        stack = self._stack()
+        _, peak = stack.pop()
+        if not self.trace_memory:
+            return None
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        elif self._owns_tracing:
+            # Outermost stage done: stop tracing so code between stages runs at full speed
+            tracemalloc.stop()
+            self._owns_tracing = False
+        return peak / (1024 * 1024)
+
+    def _emit(self, record):
+        with self._lock:
+            self.records.append(record)
+        if self.sink is not None:
+            self.sink(record)
+
+    def to_json(self):
+        """All records as a JSON array"""
+        return json.dumps([asdict(record) for record in self.records], indent=2)
+
+    def write_json(self, path):
+        with open(path, 'w') as file:
+            file.write(self.to_json())
+        print(f"Stage timings written to '{path}'")
+
+    def print_summary(self):
+        """Print one line per recorded stage, in completion order"""
+        if not self.records:
+            return
+        print("\n" + "=" * 50)
+        print("STAGE TIMINGS")
+        print("=" * 50)
+        # The RSS column is left out where the platform can't measure it
+        rss = any(record.max_rss_mb is not None for record in self.records)
+        print(f"{'Stage':<36} {'Wall':>9} {'CPU':>9} {'Rows':>9}" + (f" {'Max RSS':>10}" if rss else ""))
+        print("-" * (77 if rss else 66))
+        for record in self.records:
+            rows = '' if record.rows is None else record.rows
+            line = f"{record.stage:<36} {record.seconds:8.3f}s {record.cpu_seconds:8.3f}s {rows:>9}"
+            if rss:
+                line += f" {record.max_rss_mb:7.1f} MB" if record.max_rss_mb is not None else f" {'n/a':>10}"
+            print(line)
+
+
+class _NullStage:
+    """Shared no-op stage: entering, setting rows and exiting cost a few attribute lookups"""
+
+    rows = None
+    labels = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullRecorder:
+    """Disabled recorder; the default, so instrumented code pays almost nothing"""
+
+    enabled = False
+    records = ()
+    _stage = _NullStage()
+
+    def stage(self, name, **labels):
+        return self._stage
+
+    def write_json(self, path):
+        pass
+
+    def print_summary(self):
+        pass
+
+
+def json_lines_sink(path):
+    """Sink appending each stage record to path as one JSON object per line"""
+    lock = threading.Lock()
+
+    def sink(record):
+        with lock, open(path, 'a') as file:
+            file.write(json.dumps(asdict(record)) + "\n")
+    return sink
+
+
+def recorder_from_env():
+    """StageRecorder configured by ATM_TIMING / ATM_TIMING_JSON / ATM_TIMING_MEMORY, else NullRecorder
+
+    ATM_TIMING=1 records stages, ATM_TIMING_JSON=path also appends every record to path
+    as JSON lines, and ATM_TIMING_MEMORY=1 adds tracemalloc peaks.
+    """
+    json_path = os.environ.get('ATM_TIMING_JSON')
+    if os.environ.get('ATM_TIMING', '0').lower() in ('0', 'false', 'no', '') and not json_path:
+        return NullRecorder()
+    return StageRecorder(sink=json_lines_sink(json_path) if json_path else None,
+                         trace_memory=os.environ.get('ATM_TIMING_MEMORY', '0').lower() in ('1', 'true', 'yes'))
+
+
+_recorder = None
+
+
+def get_recorder():
+    """Process-wide recorder, configured from the environment on first use"""
+    global _recorder
+    if _recorder is None:
+        _recorder = recorder_from_env()
+    return _recorder
+
+
+def set_recorder(recorder):
+    """Install a recorder (or NullRecorder() to disable) and return the previous one"""
+    global _recorder
+    previous, _recorder = get_recorder(), recorder
+    return previous
+
+
+def stage(name, **labels):
+    """Time a stage with the process-wide recorder: with stage('load') as s: ...; s.rows = n"""
+    return get_recorder().stage(name, **labels)
@@ -0,0 +1,205 @@
+import json
+from dataclasses import dataclass
+
+import numpy as np
+
+from distance_engine import EARTH_RADIUS_KM
+from grid import CoverageGrid
+
+# Kernel support in bandwidths; the Gaussian beyond 4 sigma is below 0.04% of its peak
+KERNEL_SIGMAS = 4.0
+
+# Largest grid kernel_density evaluates (about 128 MB per float64 array); coarser cells beyond it
+MAX_KDE_CELLS = 16_000_000
+
+# Transparent -> yellow -> orange -> red ramp for the raster overlay, as (position, RGBA)
+COLOR_STOPS = [
+    (0.0, (255, 255, 178, 0)),
+    (0.25, (254, 204, 92, 140)),
+    (0.5, (253, 141, 60, 180)),
+    (0.75, (240, 59, 32, 200)),
+    (1.0, (189, 0, 38, 220)),
+]
+
+
+@dataclass
+class KDESurface:
+    grid: CoverageGrid
+    density: np.ndarray  # (n_rows, n_cols) ATMs per km^2, row 0 is the southernmost
+    bandwidth_m: float
+
+    @property
+    def bounds(self):
+        """[[south, west], [north, east]] as folium expects"""
+        grid = self.grid
+        return [[grid.south, grid.west],
+                [grid.south + grid.n_rows * grid.dlat, grid.west + grid.n_cols * grid.dlon]]
+
+    def sample(self, latitudes, longitudes):
+        """Density of the cell containing each point"""
+        rows = np.clip(((np.asarray(latitudes) - self.grid.south) / self.grid.dlat).astype(int),
+                       0, self.grid.n_rows - 1)
+        cols = np.clip(((np.asarray(longitudes) - self.grid.west) / self.grid.dlon).astype(int),
+                       0, self.grid.n_cols - 1)
+        return self.density[rows, cols]
+
+
+def scott_bandwidth_m(latitudes, longitudes):
+    """Scott's rule bandwidth (meters) for 2D data: n^(-1/6) times the mean coordinate spread"""
+    meters_per_deg = np.radians(1) * EARTH_RADIUS_KM * 1000
+    spread_y = np.std(latitudes) * meters_per_deg
+    spread_x = np.std(longitudes) * meters_per_deg * np.cos(np.radians(np.mean(latitudes)))
+    return float(len(latitudes) ** (-1 / 6) * (spread_x + spread_y) / 2)
+
+
+def linear_bin(grid, latitudes, longitudes):
+    """Spread each point over its 4 surrounding cell centers with bilinear weights"""
+    y = (np.asarray(latitudes, dtype=np.float64) - grid.south) / grid.dlat - 0.5
+    x = (np.asarray(longitudes, dtype=np.float64) - grid.west) / grid.dlon - 0.5
+    row, col = np.floor(y).astype(np.int64), np.floor(x).astype(np.int64)
+    fy, fx = y - row, x - col
+
+    counts = np.zeros(grid.size, dtype=np.float64)
+    for d_row, d_col, weight in ((0, 0, (1 - fy) * (1 - fx)), (0, 1, (1 - fy) * fx),
+                                 (1, 0, fy * (1 - fx)), (1, 1, fy * fx)):
+        r, c = row + d_row, col + d_col
+        inside = (r >= 0) & (r < grid.n_rows) & (c >= 0) & (c < grid.n_cols)
+        counts += np.bincount(r[inside] * grid.n_cols + c[inside], weights=weight[inside], minlength=grid.size)
+    return counts.reshape(grid.n_rows, grid.n_cols)
+
+
+def gaussian_kernel(bandwidth_cells):
+    """Normalized 2D Gaussian kernel truncated at KERNEL_SIGMAS bandwidths"""
+    if not bandwidth_cells > 0:
+        raise ValueError(f"kernel bandwidth must be positive, got {bandwidth_cells} cells")
+    radius = max(1, int(np.ceil(KERNEL_SIGMAS * bandwidth_cells)))
+    offsets = np.arange(-radius, radius + 1)
+    profile = np.exp(-0.5 * (offsets / bandwidth_cells) ** 2)
+    kernel = np.outer(profile, profile)
+    return kernel / kernel.sum()
+
+
+def kernel_density(latitudes, longitudes, bandwidth_m=None, cell_m=50, max_cells=MAX_KDE_CELLS):
+    """Gaussian KDE of ATM locations on a cell_m grid, in ATMs per km^2
+
+    Points are linearly binned onto the grid and the counts are convolved with the
+    kernel by FFT, so the cost is O(cells log cells) regardless of the number of ATMs.
+    bandwidth_m defaults to Scott's rule; the grid extends KERNEL_SIGMAS bandwidths
+    past the points so no density is cut off at the edges. A grid of more than
+    max_cells cells is coarsened until it fits (surface.grid.cell_m is the size used).
+    """
+    # Imported here: scipy.signal takes longer to import than most KDE runs take to compute
+    from scipy.signal import fftconvolve
+
+    if not cell_m > 0:
+        raise ValueError(f"KDE cell size must be positive, got {cell_m} m")
+    if bandwidth_m is None:
+        bandwidth_m = scott_bandwidth_m(latitudes, longitudes)
+        if not bandwidth_m > 0:
+            raise ValueError("Scott's rule gives a zero KDE bandwidth (fewer than two distinct ATM locations); "
+                             "pass an explicit bandwidth")
+    elif not (bandwidth_m > 0 and np.isfinite(bandwidth_m)):
+        raise ValueError(f"KDE bandwidth must be a positive distance, got {bandwidth_m} m")
+
+    requested_m = cell_m
+    grid = CoverageGrid.around(latitudes, longitudes, cell_m, margin_m=KERNEL_SIGMAS * bandwidth_m)
+    while grid.size > max_cells:
+        cell_m = float(cell_m * max(1.1, np.sqrt(grid.size / max_cells)))
+        grid = CoverageGrid.around(latitudes, longitudes, cell_m, margin_m=KERNEL_SIGMAS * bandwidth_m)
+    if cell_m != requested_m:
+        print(f"KDE grid coarsened from {requested_m:g} m to {cell_m:.0f} m cells to stay under {max_cells} cells")
+
+    counts = linear_bin(grid, latitudes, longitudes)
+    density = fftconvolve(counts, gaussian_kernel(bandwidth_m / cell_m), mode='same')
+
+    # FFT round-off leaves tiny negative values far from any point
+    density = np.maximum(density, 0) / (cell_m / 1000) ** 2
+    return KDESurface(grid, density, bandwidth_m)
+
+
+def ward_peak_density(surface, df):
+    """Peak KDE value (ATMs per km^2) at the ATMs of each ward, with its location"""
+    sampled = df.assign(density=surface.sample(df['latitude'].values, df['longitude'].values))
+    peaks = sampled.loc[sampled.groupby('WARD')['density'].idxmax(), ['WARD', 'density', 'latitude', 'longitude']]
+    return peaks.rename(columns={'density': 'peak_density'}).sort_values('peak_density', ascending=False)
+
+
+def density_image(surface):
+    """RGBA uint8 image of the surface on the COLOR_STOPS ramp, scaled to its maximum"""
+    scaled = surface.density / surface.density.max() if surface.density.max() > 0 else surface.density
+    positions = [position for position, _ in COLOR_STOPS]
+    channels = [np.interp(scaled, positions, [color[channel] for _, color in COLOR_STOPS])
+                for channel in range(4)]
+    return np.dstack(channels).astype(np.uint8)
+
+
+def contour_levels(surface, n_levels=5):
+    """Evenly spaced density levels between 10% of the peak and the peak"""
+    peak = float(surface.density.max())
+    return np.linspace(0.1 * peak, peak, n_levels + 1)
+
+
+def density_contours(surface, levels=None):
+    """Filled density contours as GeoJSON features, one MultiPolygon per level band"""
+    # Imported here so the raster/peak analysis works without contourpy
+    import contourpy
+
+    grid = surface.grid
+    levels = contour_levels(surface) if levels is None else np.asarray(levels)
+    longitudes = grid.west + (np.arange(grid.n_cols) + 0.5) * grid.dlon
+    latitudes = grid.south + (np.arange(grid.n_rows) + 0.5) * grid.dlat
+    generator = contourpy.contour_generator(longitudes, latitudes, surface.density, fill_type='OuterOffset')
+
+    features = []
+    for lower, upper in zip(levels[:-1], levels[1:]):
+        points, offsets = generator.filled(lower, upper if upper < levels[-1] else np.inf)
+        polygons = [[ring.round(6).tolist() for ring in np.split(polygon, ring_offsets[1:-1])]
+                    for polygon, ring_offsets in zip(points, offsets)]
+        if polygons:
+            features.append({
+                'type': 'Feature',
+                'geometry': {'type': 'MultiPolygon', 'coordinates': polygons},
+                'properties': {'lower': round(float(lower), 3), 'upper': round(float(upper), 3)},
+            })
+    return features
+
+
+def write_contours_geojson(surface, path, levels=None):
+    """Write the filled density contours as a GeoJSON FeatureCollection"""
+    collection = {
+        'type': 'FeatureCollection',
+        'properties': {'bandwidth_m': surface.bandwidth_m, 'units': 'ATMs per km2'},
+        'features': density_contours(surface, levels),
+    }
+    with open(path, 'w') as file:
+        json.dump(collection, file, separators=(',', ':'))
+    print(f"Density contours written to '{path}'")
+
+
+def add_kde_layers(density_map, surface, contours=True):
+    """Add the KDE raster (and, optionally, contour lines) to a folium map"""
+    # folium is only needed for map output
+    import folium
+    from folium.raster_layers import ImageOverlay
+
+    ImageOverlay(density_image(surface), bounds=surface.bounds, origin='lower', mercator_project=True,
+                 pixelated=False, name=f"ATM density (KDE, {surface.bandwidth_m:.0f} m)").add_to(density_map)
+
+    if contours:
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': density_contours(surface)},
+            name='Density contours',
+            style_function=lambda feature: {'color': '#7f0000', 'weight': 1, 'fillOpacity': 0},
+            tooltip=folium.GeoJsonTooltip(fields=['lower', 'upper'], aliases=['ATMs/km2 from', 'to']),
+        ).add_to(density_map)
+
+
+def print_ward_peaks(peaks, surface):
+    """Print the per-ward peak density table"""
+    print("\n" + "=" * 50)
+    print(f"PEAK ATM DENSITY BY WARD (KDE, bandwidth {surface.bandwidth_m:.0f} m)")
+    print("=" * 50)
+    print(f"{'Ward':<6} {'Peak ATMs/km2':>14} {'Peak Lat':>12} {'Peak Lon':>12}")
+    print("-" * 47)
+    for ward, peak, lat, lon in zip(peaks['WARD'], peaks['peak_density'], peaks['latitude'], peaks['longitude']):
+        print(f"{int(ward):<6} {peak:14.2f} {lat:12.6f} {lon:12.6f}")
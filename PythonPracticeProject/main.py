@@ -1,34 +1,60 @@
-import pandas as pd
-from database_connect import MYSQLConnect
-from schema_manager import create_mysql_schema
+import argparse
+
+from schema_manager import create_mysql_schema, ensure_mysql_schema
 from database_config import MYSQLConfig
-from sqlalchemy import create_engine
-from ATM_analyze import ATMDensityAnalyzer
-
-
-def main():
-    df = pd.read_csv('ATM_Banking.csv')
-    config = MYSQLConfig(
-        host='localhost',
-        port=3306,
-        user='root',
-        password='123',
-        table='ATM_DATA',
-        database='ATM_DATA'
-    )
-
-    with MYSQLConnect(config.host, config.port, config.user, config.password) as my_sql_client:
+from engine_factory import admin_connection, dispose_engines, get_engine, print_checkout_metrics
+from bulk_loader import bulk_load
+from delta_sync import sync_csv
+from instrumentation import get_recorder, stage
+from result_cache import ResultCache
+
+
+def ingest(config, rebuild=False, csv_path='ATM_Banking.csv'):
+    """Load csv_path into ATM_DATA: full rebuild, or create-if-missing then sync the delta"""
+    # Server-level connection for DDL and loading; analysis reads go through the shared pool
+    with admin_connection(config) as my_sql_client, stage('ingest', rebuild=rebuild) as ingest:
         connection, cursor = my_sql_client.connection, my_sql_client.cursor
-        create_mysql_schema(connection, cursor)
-        url = "mysql+mysqlconnector://{}:{}@{}:{}/{}".format(config.user, config.password, config.host, config.port,
-                                                             config.database)
-        engine = create_engine(url)
-        df.to_sql(config.table, con=engine, if_exists="append", index=False)
+        if rebuild:
+            # Full rebuild: drop everything and stream the CSV in chunks over the same connection
+            with stage('schema'):
+                create_mysql_schema(connection, cursor)
+            with stage('bulk_load') as s:
+                s.rows = ingest.rows = bulk_load(connection, csv_path, table=config.table).rows
+        else:
+            # Incremental refresh: create the schema only if missing, then upsert/tombstone the delta
+            with stage('schema'):
+                created = ensure_mysql_schema(connection, cursor, config.table)
+            if created:
+                with stage('bulk_load') as s:
+                    s.rows = ingest.rows = bulk_load(connection, csv_path, table=config.table).rows
+            else:
+                with stage('sync') as s:
+                    s.rows = ingest.rows = sync_csv(connection, csv_path, table=config.table).changed
+
+
+def main(rebuild=False, render_mode='markers'):
+    # Imported here so ingest-only callers (atm_cli.py ingest) skip the analysis imports
+    from ATM_analyze import ATMDensityAnalyzer
+
+    config = MYSQLConfig.from_env()
+    try:
+        ingest(config, rebuild)
 
         # Run ATM Analysis
-        analyzer = ATMDensityAnalyzer()
-        analyzer.run_analysis()
+        analyzer = ATMDensityAnalyzer(engine=get_engine(config), cache=ResultCache.from_env())
+        analyzer.run_analysis(render_mode=render_mode)
+    finally:
+        get_recorder().print_summary()
+        print_checkout_metrics()
+        dispose_engines()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Load ATM_Banking.csv into MySQL and run the density analysis")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="drop and recreate ATM_DATA instead of syncing only the changed rows")
+    parser.add_argument("--render-mode", choices=["markers", "cluster", "tiles"], default="markers",
+                        help="'cluster' renders ATMs through a FastMarkerCluster, 'tiles' draws "
+                             "precomputed multi-zoom density cells instead of individual ATMs")
+    args = parser.parse_args()
+    main(rebuild=args.rebuild, render_mode=args.render_mode)
\ No newline at end of file
@@ -0,0 +1,94 @@
+from functools import lru_cache
+
+import numpy as np
+from pyproj import Transformer
+
+# The CSV's X/Y are Web Mercator meters (e.g. X=-8579996, Y=4716489 for upper NW DC).
+# Reading them as EPSG:2893 (Maryland State Plane, US feet) lands every ATM in Idaho.
+SOURCE_CRS = "EPSG:3857"
+TARGET_CRS = "EPSG:4326"
+CANDIDATE_CRS = ("EPSG:3857", "EPSG:2893")
+
+# XCOORD/YCOORD are the DC/Maryland State Plane meter coordinates published with the data
+REFERENCE_CRS = "EPSG:26985"
+
+# Maximum disagreement (degrees, roughly 100 m) between X/Y and XCOORD/YCOORD projections
+CRS_TOLERANCE_DEG = 0.001
+
+
+@lru_cache(maxsize=None)
+def get_transformer(source_crs, target_crs=TARGET_CRS):
+    """Return a cached Transformer, so each CRS pair is only built once per process"""
+    return Transformer.from_crs(source_crs, target_crs, always_xy=True)
+
+
+def project_xy(x, y, source_crs=SOURCE_CRS):
+    """Project X/Y arrays to WGS84, returning (longitude, latitude)"""
+    return get_transformer(source_crs).transform(np.asarray(x, dtype=np.float64),
+                                                 np.asarray(y, dtype=np.float64))
+
+
+def valid_coordinates(latitude, longitude):
+    """Boolean mask of finite, in-range WGS84 coordinates"""
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    return (np.isfinite(latitude) & np.isfinite(longitude) &
+            (latitude >= -90) & (latitude <= 90) &
+            (longitude >= -180) & (longitude <= 180))
+
+
+def detect_source_crs(df, candidates=CANDIDATE_CRS):
+    """Pick the CRS of the X/Y columns by checking them against XCOORD/YCOORD
+
+    Each candidate is projected and compared with the State Plane reference columns;
+    the candidate with the smallest median disagreement wins. Without reference
+    columns the first candidate that yields valid coordinates is used.
+    """
+    has_reference = {'XCOORD', 'YCOORD'}.issubset(df.columns) and df['XCOORD'].notna().any()
+    if not has_reference:
+        for crs in candidates:
+            lon, lat = project_xy(df['X'].values, df['Y'].values, crs)
+            if valid_coordinates(lat, lon).all():
+                return crs
+        raise ValueError(f"None of {candidates} produce valid coordinates for X/Y")
+
+    ref_lon, ref_lat = project_xy(df['XCOORD'].values, df['YCOORD'].values, REFERENCE_CRS)
+    errors = {}
+    for crs in candidates:
+        lon, lat = project_xy(df['X'].values, df['Y'].values, crs)
+        errors[crs] = np.nanmedian(np.hypot(lon - ref_lon, lat - ref_lat))
+
+    best = min(errors, key=errors.get)
+    if errors[best] > CRS_TOLERANCE_DEG:
+        raise ValueError(f"X/Y do not match XCOORD/YCOORD in any candidate CRS: {errors}")
+    return best
+
+
+def project_coordinates(df, source_crs=None):
+    """Ingest stage: add latitude/longitude/coord_valid columns projected from X/Y
+
+    The source CRS is verified with detect_source_crs unless given explicitly.
+    """
+    if source_crs is None:
+        source_crs = detect_source_crs(df)
+        print(f"Verified source CRS for X/Y: {source_crs}")
+
+    longitude, latitude = project_xy(df['X'].values, df['Y'].values, source_crs)
+    df = df.assign(latitude=latitude, longitude=longitude)
+    df['coord_valid'] = valid_coordinates(latitude, longitude)
+    return df
+
+
+def ensure_wgs84(df, source_crs=None):
+    """Use stored latitude/longitude when present, otherwise project X/Y once
+
+    Returns the frame with latitude/longitude columns plus a boolean validity mask.
+    """
+    if {'latitude', 'longitude'}.issubset(df.columns) and df['latitude'].notna().any():
+        valid = valid_coordinates(df['latitude'].values, df['longitude'].values)
+        if 'coord_valid' in df.columns:
+            valid &= df['coord_valid'].fillna(False).astype(bool).values
+        return df, valid
+
+    df = project_coordinates(df, source_crs)
+    return df, df['coord_valid'].values
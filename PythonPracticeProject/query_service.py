@@ -0,0 +1,343 @@
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from ATM_analyze import ATMDensityAnalyzer
+from aggregation_cube import AggregationCube
+from data_sources import SnapshotSource
+from engine_factory import dispose_engines
+from spatial_index import ATMSpatialIndex
+
+# Columns returned for every ATM in a nearest/within answer
+RESULT_COLUMNS = ['OBJECTID', 'NAME', 'ADDRESS', 'WARD', 'ZIPCODE', 'latitude', 'longitude']
+
+# Query points accepted per request; larger batches should be split by the client
+MAX_BATCH = 10000
+MAX_K = 100
+TOP_BRANDS = 5
+
+
+class BadRequest(ValueError):
+    """Malformed query; answered with HTTP 400"""
+
+
+class LatencyMetrics:
+    """Rolling request latencies (seconds) for one endpoint"""
+
+    def __init__(self, maxlen=10000):
+        self.samples = deque(maxlen=maxlen)
+        self.count = 0
+        self.errors = 0
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, items=0, error=False):
+        with self._lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.items += items
+            self.errors += error
+
+    def summary(self):
+        """Request/error/item counts and p50/p99/max latency in milliseconds"""
+        with self._lock:
+            samples = np.array(self.samples) * 1000
+            summary = {'requests': self.count, 'errors': self.errors, 'items': self.items}
+        if not len(samples):
+            return {**summary, 'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+        return {
+            **summary,
+            'p50_ms': round(float(np.percentile(samples, 50)), 3),
+            'p99_ms': round(float(np.percentile(samples, 99)), 3),
+            'max_ms': round(float(samples.max()), 3),
+        }
+
+
+def density_records(cube, dimension, key_name):
+    """Per-ward (or per-ZIP) ATM count, share, centroid and top brands, keyed by int value"""
+    stats = cube.roll_up(dimension)
+    brands = cube.crosstab(dimension)
+    total = cube.total
+    records = {}
+    for value, count, lat, lon in zip(stats[dimension], stats['atm_count'], stats['latitude'], stats['longitude']):
+        top = brands.loc[value].nlargest(TOP_BRANDS)
+        records[int(value)] = {
+            key_name: int(value),
+            'atm_count': int(count),
+            'share': round(int(count) / total, 6),
+            'centroid': [round(float(lat), 6), round(float(lon), 6)],
+            'brands': int((brands.loc[value] > 0).sum()),
+            'top_brands': [[str(name), int(n)] for name, n in top.items() if n > 0],
+        }
+    return records
+
+
+@dataclass
+class ServiceState:
+    """Everything one generation of the data serves from; replaced wholesale on reload"""
+    index: ATMSpatialIndex
+    columns: dict  # RESULT_COLUMNS -> list of plain Python values, by index position
+    wards: dict
+    zipcodes: dict
+    version: object
+    loaded_at: float
+    load_seconds: float
+
+    @classmethod
+    def load(cls, analyzer):
+        """Load and project the ATMs once, then build the spatial index and ward/ZIP aggregates"""
+        start = time.perf_counter()
+        version = analyzer.dataset_version()
+        analyzer.load_data()
+        analyzer.convert_coordinates()
+
+        index = ATMSpatialIndex.from_analyzer(analyzer)
+        columns = {column: index.df[column].to_numpy(dtype=object if column in ('NAME', 'ADDRESS') else None).tolist()
+                   for column in RESULT_COLUMNS}
+        cube = AggregationCube.from_frame(index.df)
+        return cls(index, columns, density_records(cube, 'WARD', 'ward'),
+                   density_records(cube, 'ZIPCODE', 'zipcode'), version, time.time(), time.perf_counter() - start)
+
+    def atm(self, position, distance_km):
+        record = {column: values[position] for column, values in self.columns.items()}
+        record['distance_km'] = round(float(distance_km), 4)
+        return record
+
+
+def parse_points(body):
+    """[[lat, lon], ...] or [{"lat": .., "lon": ..}, ...] as two float arrays"""
+    points = body.get('points')
+    if not isinstance(points, list) or not points:
+        raise BadRequest("'points' must be a non-empty list of [lat, lon] pairs")
+    if len(points) > MAX_BATCH:
+        raise BadRequest(f"at most {MAX_BATCH} points per request")
+    try:
+        pairs = [(point['lat'], point['lon']) if isinstance(point, dict) else point for point in points]
+        coordinates = np.array(pairs, dtype=np.float64)
+    except (KeyError, TypeError, ValueError):
+        raise BadRequest("each point must be [lat, lon] or {\"lat\": .., \"lon\": ..}")
+    if coordinates.shape != (len(points), 2) or not np.isfinite(coordinates).all():
+        raise BadRequest("each point must be [lat, lon] or {\"lat\": .., \"lon\": ..}")
+    return coordinates[:, 0], coordinates[:, 1]
+
+
+def exact_int(value):
+    """value as an int if it is one exactly: an int, an integral float or an integer string (not a bool)"""
+    if isinstance(value, bool):
+        raise TypeError("booleans are not integers")
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{value} is not an integer")
+    if not isinstance(value, (int, float, str)):
+        raise TypeError(f"{type(value).__name__} is not an integer")
+    return int(value)
+
+
+def query_filters(body):
+    """Optional name/ward/zipcode filters, each a value or a list of values"""
+    filters = {}
+    for key, cast in (('name', str), ('ward', int), ('zipcode', int)):
+        value = body.get(key)
+        if value is None:
+            continue
+        try:
+            filters[key] = [cast(item) for item in value] if isinstance(value, list) else cast(value)
+        except (TypeError, ValueError):
+            raise BadRequest(f"invalid '{key}' filter")
+    return filters
+
+
+class ATMQueryService:
+    """Warm in-memory state plus the query handlers behind the HTTP endpoints
+
+    Queries read self.state once, so a reload builds the next generation on the side
+    and swaps it in with one assignment; requests in flight finish on the old one.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.metrics = {}
+        self._metrics_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.state = ServiceState.load(analyzer)
+
+    def endpoint_metrics(self, endpoint):
+        with self._metrics_lock:
+            return self.metrics.setdefault(endpoint, LatencyMetrics())
+
+    def nearest(self, body):
+        """k nearest ATMs to each point: {"points": [[lat, lon], ...], "k": 5, "name"/"ward"/"zipcode": ...}"""
+        latitudes, longitudes = parse_points(body)
+        try:
+            k = exact_int(body.get('k', 5))
+        except (TypeError, ValueError):
+            raise BadRequest(f"'k' must be an integer between 1 and {MAX_K}")
+        if not 1 <= k <= MAX_K:
+            raise BadRequest(f"'k' must be between 1 and {MAX_K}")
+
+        state = self.state
+        distances, positions = state.index.knn(latitudes, longitudes, k=k, **query_filters(body))
+        results = [[state.atm(position, distance) for position, distance in zip(row_positions, row_distances)
+                    if position >= 0] for row_positions, row_distances in zip(positions.tolist(), distances.tolist())]
+        return {'results': results}, len(results)
+
+    def within(self, body):
+        """All ATMs within radius_km of each point: {"points": [...], "radius_km": 0.5, filters...}"""
+        latitudes, longitudes = parse_points(body)
+        try:
+            radius_km = float(body['radius_km'])
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest("'radius_km' is required")
+        if not np.isfinite(radius_km) or radius_km < 0:
+            raise BadRequest("'radius_km' must be a finite, non-negative distance")
+
+        state = self.state
+        hits = state.index.within_radius(latitudes, longitudes, radius_km, **query_filters(body))
+        results = [[state.atm(position, distance) for position, distance in zip(positions.tolist(), distances.tolist())]
+                   for positions, distances in hits]
+        return {'results': results}, len(results)
+
+    def density(self, body):
+        """Ward/ZIP aggregates: {"wards": [1, 2], "zipcodes": [20001]}; omitted lists return every key"""
+        state = self.state
+        answer = {}
+        for key, records in (('wards', state.wards), ('zipcodes', state.zipcodes)):
+            values = body.get(key)
+            if values is None:
+                answer[key] = list(records.values())
+                continue
+            try:
+                answer[key] = [records.get(int(value)) for value in values]
+            except (TypeError, ValueError):
+                raise BadRequest(f"'{key}' must be a list of integers")
+        return answer, len(answer['wards']) + len(answer['zipcodes'])
+
+    def health(self):
+        state = self.state
+        return {'status': 'ok', 'atms': len(state.index), 'wards': len(state.wards),
+                'zipcodes': len(state.zipcodes), 'loaded_at': state.loaded_at,
+                'load_seconds': round(state.load_seconds, 3)}
+
+    def metrics_summary(self):
+        with self._metrics_lock:
+            endpoints = dict(self.metrics)
+        return {'endpoints': {name: metrics.summary() for name, metrics in sorted(endpoints.items())},
+                **self.health()}
+
+    def reload(self, body):
+        """Rebuild the state from the source; with "if_changed": true, only when the data fingerprint moved"""
+        with self._reload_lock:
+            if body.get('if_changed') and self.analyzer.dataset_version() == self.state.version:
+                return {'reloaded': False, 'atms': len(self.state.index)}, 0
+            self.state = ServiceState.load(self.analyzer)
+            return {'reloaded': True, 'atms': len(self.state.index),
+                    'load_seconds': round(self.state.load_seconds, 3)}, 0
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """JSON over HTTP; POST bodies carry batches, GET query strings answer a single point"""
+    server_version = 'ATMQueryService/1.0'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        service = self.server.service
+
+        if url.path == '/health':
+            return self._send(200, service.health())
+        if url.path == '/metrics':
+            return self._send(200, service.metrics_summary())
+        if url.path in ('/nearest', '/within'):
+            # Single point from the query string, e.g. /nearest?lat=38.9&lon=-77.03&k=3
+            body = {key: value for key, value in params.items() if key not in ('lat', 'lon')}
+            body['points'] = [[params.get('lat'), params.get('lon')]]
+            return self._answer(url.path[1:], body)
+        if len(parts) in (2, 3) and parts[0] == 'density' and parts[1] in ('ward', 'zip'):
+            key = 'wards' if parts[1] == 'ward' else 'zipcodes'
+            return self._answer('density', {key: parts[2:] or None,
+                                            ('zipcodes' if key == 'wards' else 'wards'): []})
+        self._send(404, {'error': f"unknown path {url.path}"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path.strip('/')
+        if path not in ('nearest', 'within', 'density', 'reload'):
+            return self._send(404, {'error': f"unknown path /{path}"})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(body, dict):
+                raise ValueError("body must be a JSON object")
+        except ValueError as e:
+            return self._send(400, {'error': f"invalid JSON body: {e}"})
+        self._answer(path, body)
+
+    def _answer(self, endpoint, body):
+        service = self.server.service
+        start = time.perf_counter()
+        items, error = 0, True
+        try:
+            answer, items = getattr(service, endpoint)(body)
+            status, error = 200, False
+        except BadRequest as e:
+            status, answer = 400, {'error': str(e)}
+        except Exception as e:
+            status, answer = 500, {'error': f"{type(e).__name__}: {e}"}
+        finally:
+            service.endpoint_metrics(endpoint).record(time.perf_counter() - start, items, error)
+        self._send(status, answer)
+
+    def _send(self, status, payload):
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service, host='127.0.0.1', port=8765, verbose=False):
+    """ThreadingHTTPServer answering queries from service"""
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def main():
+    """Load the ATM data once and serve nearest/density queries until interrupted"""
+    parser = argparse.ArgumentParser(description="Local HTTP service for nearest-ATM and density queries")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--snapshot", help="serve a columnar snapshot instead of MySQL")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    try:
+        service = ATMQueryService(ATMDensityAnalyzer(source=SnapshotSource(args.snapshot) if args.snapshot else None))
+        server = make_server(service, args.host, args.port, args.verbose)
+        print(f"Serving {len(service.state.index)} ATMs on http://{args.host}:{server.server_port} "
+              f"(loaded in {service.state.load_seconds:.2f}s)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nShutting down...")
+        finally:
+            server.server_close()
+    finally:
+        dispose_engines()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import glob
+import hashlib
+import io
+import os
+import pickle
+import sys
+import tempfile
+from contextlib import contextmanager, redirect_stdout, suppress
+
+DEFAULT_DIR = '.atm_cache'
+DEFAULT_MAX_MB = 256
+
+
+def _digest(value):
+    return hashlib.sha256(repr(value).encode('utf-8')).hexdigest()[:24]
+
+
+class ResultCache:
+    """On-disk cache of analysis outputs keyed on (namespace, data fingerprint)
+
+    A namespace names one kind of output with its parameters (e.g. the density analysis
+    in 'cluster' mode, or one brand's map); the fingerprint is a cheap version of the data
+    it was computed from (see sql_aggregates.dataset_version / brand_version). Storing
+    a new fingerprint for a namespace drops that namespace's stale entries only. When
+    the directory grows beyond max_bytes, least recently used entries are evicted.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """ResultCache configured by ATM_CACHE_DIR / ATM_CACHE_MAX_MB, or None when ATM_CACHE=0"""
+        if os.environ.get('ATM_CACHE', '1').lower() in ('0', 'false', 'no'):
+            return None
+        return cls(os.environ.get('ATM_CACHE_DIR', DEFAULT_DIR),
+                   int(float(os.environ.get('ATM_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024))
+
+    def _path(self, namespace, fingerprint):
+        return os.path.join(self.directory, f"{_digest(namespace)}.{_digest(fingerprint)}.pkl")
+
+    def get(self, namespace, fingerprint):
+        """Cached value for the namespace at this fingerprint, or None"""
+        path = self._path(namespace, fingerprint)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # Missing, partial, or pickled from classes that no longer exist
+            return None
+        # Touch the entry so eviction sees it as recently used
+        os.utime(path)
+        return value
+
+    def put(self, namespace, fingerprint, value):
+        """Store value, replacing any entry of the namespace computed from other data"""
+        path = self._path(namespace, fingerprint)
+        for stale in glob.glob(os.path.join(self.directory, f"{_digest(namespace)}.*.pkl")):
+            if stale != path:
+                with suppress(FileNotFoundError):
+                    os.remove(stale)
+
+        # Write to a temporary file first so readers never see a partial entry
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def entries(self):
+        """(path, size, last used) of every entry"""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.pkl')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            with suppress(FileNotFoundError):
+                os.remove(path)
+            total -= size
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            with suppress(FileNotFoundError):
+                os.remove(path)
+
+
+class _Tee(io.StringIO):
+    """String buffer that also writes through to another stream"""
+
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text)
+        return super().write(text)
+
+
+@contextmanager
+def capture_output():
+    """Record everything printed inside the block while still printing it"""
+    tee = _Tee(sys.stdout)
+    with redirect_stdout(tee):
+        yield tee
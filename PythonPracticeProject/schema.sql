@@ -15,5 +15,15 @@ CREATE TABLE IF NOT EXISTS ATM_DATA (
     EDITOR VARCHAR(255),
     EDITED TIMESTAMP NULL DEFAULT NULL,
     GLOBALID CHAR(100),
-    OBJECTID INT PRIMARY KEY
+    OBJECTID INT PRIMARY KEY,
+    latitude DOUBLE,
+    longitude DOUBLE,
+    coord_valid TINYINT(1) NOT NULL DEFAULT 0,
+    ROW_HASH CHAR(16),
+    ROW_CHECKSUM BIGINT,
+    DELETED TINYINT(1) NOT NULL DEFAULT 0
 );
+
+CREATE INDEX idx_atm_ward_name ON ATM_DATA (WARD, NAME);
+CREATE INDEX idx_atm_zip_name ON ATM_DATA (ZIPCODE, NAME);
+CREATE INDEX idx_atm_name ON ATM_DATA (NAME);
@@ -1,6 +1,19 @@
+import os
+
 from mysql.connector import Error
 
-SQL_PATH = "C:\\Users\\Public\\PythonPracticeProject\\schema.sql"
+SQL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+
+# Columns added to ATM_DATA after the original schema; tables missing them are rebuilt
+REQUIRED_COLUMNS = ('latitude', 'longitude', 'coord_valid', 'ROW_HASH', 'ROW_CHECKSUM', 'DELETED')
+
+
+def read_schema_commands(path=SQL_PATH):
+    """Split schema.sql into individual statements"""
+    with open(path, 'r') as file:
+        sql_script = file.read()
+    return [cmd.strip() for cmd in sql_script.split(';') if cmd.strip()]
+
 
 def create_mysql_schema(connection , cursor):
     database = "ATM_DATA"
@@ -10,13 +23,52 @@ def create_mysql_schema(connection , cursor):
     print(f"-----------------CREATE {database} SUCCESS------------------")
     connection.database = database
     try:
-        with open(SQL_PATH, 'r') as file:
-            sql_script = file.read()
-            sql_commands = [cmd.strip() for cmd in sql_script.split(';') if cmd.strip()]
-
-        for cmd in sql_commands:
+        for cmd in read_schema_commands():
             cursor.execute(cmd)
             print(f"------------Executed my sql command-----------")
     except Error as e:
         connection.rollback()
         raise Exception(f"-----------Failed to create mysql schema : {e} -------------") from e
+
+
+def ensure_mysql_schema(connection, cursor, table="ATM_DATA"):
+    """Create the database and table only when missing, keeping existing data in place"""
+    database = "ATM_DATA"
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+    connection.database = database
+
+    cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+        (database, table)
+    )
+    columns = {row[0].lower() for row in cursor.fetchall()}
+
+    if not columns:
+        print(f"-----------------{table} missing, creating schema------------------")
+        create_mysql_schema(connection, cursor)
+        return True
+
+    missing = [column for column in REQUIRED_COLUMNS if column.lower() not in columns]
+    if missing:
+        print(f"-----------------{table} is missing columns {missing}, rebuilding------------------")
+        create_mysql_schema(connection, cursor)
+        return True
+
+    ensure_indexes(cursor, database, table)
+    print(f"-----------------{database} schema up to date------------------")
+    return False
+
+
+def ensure_indexes(cursor, database="ATM_DATA", table="ATM_DATA"):
+    """Create any secondary index from schema.sql that an existing table is missing"""
+    cursor.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+        (database, table)
+    )
+    existing = {row[0].lower() for row in cursor.fetchall()}
+
+    for cmd in read_schema_commands():
+        words = cmd.split()
+        if [word.upper() for word in words[:2]] == ['CREATE', 'INDEX'] and words[2].lower() not in existing:
+            cursor.execute(cmd)
+            print(f"------------Created index {words[2]}-----------")
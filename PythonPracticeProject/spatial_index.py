@@ -0,0 +1,153 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from distance_engine import EARTH_RADIUS_KM
+
+FILTER_COLUMNS = {'name': 'NAME', 'ward': 'WARD', 'zipcode': 'ZIPCODE'}
+
+# Filtered sub-trees kept warm; filters come from service clients, so the cache is bounded
+MAX_FILTER_TREES = 32
+
+
+def to_unit_xyz(latitudes, longitudes):
+    """Project lat/lon (degrees) onto the unit sphere as 3D cartesian points"""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    """Convert unit-sphere chord length to great-circle distance in km"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def km_to_chord(km):
+    """Convert great-circle distance in km to unit-sphere chord length"""
+    return 2 * np.sin(np.minimum(np.asarray(km, dtype=np.float64) / (2 * EARTH_RADIUS_KM), np.pi / 2))
+
+
+class ATMSpatialIndex:
+    """KD-tree index over ATM locations for k-nearest and radius queries
+
+    Points live on the unit sphere in 3D, where straight-line (chord) distance is
+    monotonic in great-circle distance, so neighbors are exact anywhere on earth.
+    Filtered queries (NAME/WARD/ZIPCODE) use a sub-tree built on first use; the
+    max_trees most recently used sub-trees are kept warm for later queries.
+    """
+
+    def __init__(self, df, leafsize=16, max_trees=MAX_FILTER_TREES):
+        """Build the index from a frame with latitude/longitude columns"""
+        self.df = df.reset_index(drop=True)
+        self.leafsize = leafsize
+        self.max_trees = max_trees
+        self.xyz = to_unit_xyz(self.df['latitude'].values, self.df['longitude'].values)
+        self._tree = (cKDTree(self.xyz, leafsize=leafsize), np.arange(len(self.df)))
+        self._trees = OrderedDict()
+        self._trees_lock = threading.Lock()
+
+    @classmethod
+    def from_analyzer(cls, analyzer, leafsize=16):
+        """Build the index from an ATMDensityAnalyzer after convert_coordinates"""
+        return cls(analyzer.df.assign(ADDRESS=analyzer.store.addresses()), leafsize=leafsize)
+
+    def __len__(self):
+        return len(self.df)
+
+    def _filter_key(self, filters):
+        """Normalize name/ward/zipcode filters into a hashable cache key"""
+        key = []
+        for arg, column in FILTER_COLUMNS.items():
+            value = filters.get(arg)
+            if value is None:
+                continue
+            values = [value] if np.isscalar(value) else list(value)
+            key.append((column, tuple(sorted(values))))
+        return tuple(key) or None
+
+    def _tree_for(self, filters):
+        """Return (tree, positions) for the filtered subset, building it on first use"""
+        key = self._filter_key(filters)
+        if key is None:
+            return self._tree
+        with self._trees_lock:
+            if key in self._trees:
+                self._trees.move_to_end(key)
+                return self._trees[key]
+
+        mask = np.ones(len(self.df), dtype=bool)
+        for column, values in key:
+            mask &= self.df[column].isin(values).values
+        positions = np.flatnonzero(mask)
+        tree = cKDTree(self.xyz[positions], leafsize=self.leafsize) if len(positions) else None
+
+        with self._trees_lock:
+            self._trees[key] = (tree, positions)
+            while len(self._trees) > self.max_trees:
+                self._trees.popitem(last=False)
+        return tree, positions
+
+    def knn(self, latitudes, longitudes, k=5, name=None, ward=None, zipcode=None):
+        """Batched k-nearest query
+
+        Returns (distances_km, positions) arrays of shape (n_queries, k). Positions index
+        rows of self.df; slots without a neighbor hold inf distance and position -1.
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        query = to_unit_xyz(np.atleast_1d(latitudes), np.atleast_1d(longitudes))
+        tree, positions = self._tree_for({'name': name, 'ward': ward, 'zipcode': zipcode})
+
+        distances = np.full((len(query), k), np.inf)
+        result = np.full((len(query), k), -1, dtype=np.int64)
+        if tree is None:
+            return distances, result
+
+        chord, local = tree.query(query, k=k)
+        chord, local = chord.reshape(len(query), k), local.reshape(len(query), k)
+        found = local < len(positions)
+        distances[found] = chord_to_km(chord[found])
+        result[found] = positions[local[found]]
+        return distances, result
+
+    def within_radius(self, latitudes, longitudes, radius_km, name=None, ward=None, zipcode=None):
+        """Batched radius query
+
+        Returns one (positions, distances_km) pair per query point, sorted by distance.
+        """
+        if not np.isfinite(radius_km) or radius_km < 0:
+            raise ValueError(f"radius_km must be a finite, non-negative distance, got {radius_km}")
+        query = to_unit_xyz(np.atleast_1d(latitudes), np.atleast_1d(longitudes))
+        tree, positions = self._tree_for({'name': name, 'ward': ward, 'zipcode': zipcode})
+        if tree is None:
+            return [(np.empty(0, dtype=np.int64), np.empty(0)) for _ in range(len(query))]
+
+        results = []
+        for point, hits in zip(query, tree.query_ball_point(query, km_to_chord(radius_km))):
+            hits = np.asarray(hits, dtype=np.int64)
+            distances = chord_to_km(np.linalg.norm(tree.data[hits] - point, axis=1))
+            order = np.argsort(distances)
+            results.append((positions[hits[order]], distances[order]))
+        return results
+
+    def nearest_atms(self, latitude, longitude, k=5, name=None, ward=None, zipcode=None):
+        """Return the k closest ATMs to a single point as rows with a distance_km column"""
+        distances, positions = self.knn(latitude, longitude, k=k, name=name, ward=ward, zipcode=zipcode)
+        found = positions[0] >= 0
+        return self.rows(positions[0][found], distances[0][found])
+
+    def atms_within(self, latitude, longitude, radius_km, name=None, ward=None, zipcode=None):
+        """Return all ATMs within radius_km of a single point as rows with a distance_km column"""
+        positions, distances = self.within_radius(latitude, longitude, radius_km,
+                                                  name=name, ward=ward, zipcode=zipcode)[0]
+        return self.rows(positions, distances)
+
+    def rows(self, positions, distances=None):
+        """Look up index positions in the source frame, optionally attaching distances"""
+        rows = self.df.iloc[positions]
+        if distances is not None:
+            rows = rows.assign(distance_km=distances)
+        return rows
@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from engine_factory import dispose_engines
+from instrumentation import get_recorder, stage
+from projection import TARGET_CRS, get_transformer
+
+# Properties tried, in order, when a boundary file's key property isn't given
+WARD_KEYS = ('WARD', 'WARD_ID', 'WARD_NUM', 'ward')
+ZIP_KEYS = ('ZIPCODE', 'ZIP', 'ZCTA5CE20', 'ZCTA5CE10', 'GEOID20', 'GEOID10', 'zipcode')
+
+
+def _pick_key(properties, key, candidates):
+    if key is not None:
+        return key
+    for candidate in candidates:
+        if candidate in properties:
+            return candidate
+    raise ValueError(f"none of {', '.join(candidates)} found in boundary properties {sorted(properties)}")
+
+
+@dataclass
+class BoundaryLayer:
+    """Polygons of one boundary set (wards or ZIP codes) with their integer keys
+
+    Geometries are in crs (WGS84 for GeoJSON, per RFC 7946; the .prj CRS for shapefiles).
+    """
+    name: str
+    geometries: np.ndarray  # shapely Polygons/MultiPolygons
+    keys: np.ndarray  # int64 key of each geometry
+    crs: str = TARGET_CRS
+    path: str = None
+
+    @classmethod
+    def from_file(cls, path, key=None, candidates=WARD_KEYS, name=None):
+        """Read a GeoJSON FeatureCollection or an ESRI shapefile (requires pyshp)"""
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        if path.lower().endswith('.shp'):
+            return cls._from_shapefile(path, key, candidates, name)
+
+        with open(path, encoding='utf-8') as file:
+            features = json.load(file)['features']
+        key = _pick_key(features[0]['properties'], key, candidates)
+        geometries = shapely.from_geojson([json.dumps(feature['geometry']) for feature in features])
+        keys = [feature['properties'][key] for feature in features]
+        return cls(name, np.asarray(geometries), np.asarray(keys, dtype=np.int64), TARGET_CRS, path)
+
+    @classmethod
+    def _from_shapefile(cls, path, key, candidates, name):
+        # Imported here so GeoJSON boundaries work without pyshp
+        import shapefile
+
+        with shapefile.Reader(path) as reader:
+            fields = [field[0] for field in reader.fields[1:]]
+            key = _pick_key(fields, key, candidates)
+            records = reader.shapeRecords()
+            geometries = [shapely.geometry.shape(record.shape.__geo_interface__) for record in records]
+            keys = [record.record[key] for record in records]
+
+        crs = TARGET_CRS
+        prj = os.path.splitext(path)[0] + '.prj'
+        if os.path.exists(prj):
+            with open(prj) as file:
+                crs = file.read()
+        return cls(name, np.asarray(geometries, dtype=object), np.asarray(keys, dtype=np.int64), crs, path)
+
+    def version(self):
+        """Fingerprint of the boundary file, for result caching"""
+        return self.path, os.path.getsize(self.path), os.path.getmtime(self.path)
+
+    def latlon_bounds(self):
+        """(latitudes, longitudes) of the corners of the layer's bounding box, in WGS84"""
+        west, south, east, north = shapely.total_bounds(self.geometries)
+        x, y = np.array([west, east, east, west]), np.array([south, south, north, north])
+        if self.crs != TARGET_CRS:
+            x, y = get_transformer(self.crs, TARGET_CRS).transform(x, y)
+        return y, x
+
+    def assign(self, latitudes, longitudes):
+        """Key of the polygon containing each point, -1 where none does
+
+        Points are indexed once by sorted longitude; each polygon takes the points in its
+        bounding-box strip by binary search and tests them in one vectorized, prepared
+        intersects_xy call, so no per-point Python objects or loops are involved.
+        A point on a shared border takes the key of the first polygon in file order.
+        """
+        x, y = np.asarray(longitudes, dtype=np.float64), np.asarray(latitudes, dtype=np.float64)
+        if self.crs != TARGET_CRS:
+            x, y = get_transformer(TARGET_CRS, self.crs).transform(x, y)
+
+        order = np.argsort(x, kind='stable')
+        sorted_x = x[order]
+        shapely.prepare(self.geometries)
+
+        assigned = np.full(len(x), -1, dtype=np.int64)
+        for polygon, key, (west, south, east, north) in zip(self.geometries, self.keys,
+                                                            shapely.bounds(self.geometries)):
+            candidates = order[np.searchsorted(sorted_x, west, side='left'):np.searchsorted(sorted_x, east, side='right')]
+            candidates = candidates[(y[candidates] >= south) & (y[candidates] <= north) & (assigned[candidates] < 0)]
+            inside = shapely.intersects_xy(polygon, x[candidates], y[candidates])
+            assigned[candidates[inside]] = key
+        return assigned
+
+
+@dataclass
+class Boundaries:
+    """Ward and/or ZIP boundary layers used to assign WARD and ZIPCODE from coordinates"""
+    wards: BoundaryLayer = None
+    zipcodes: BoundaryLayer = None
+
+    @classmethod
+    def from_files(cls, ward_path=None, zip_path=None, ward_key=None, zip_key=None):
+        """Boundaries from whichever files are given; None when neither is"""
+        if ward_path is None and zip_path is None:
+            return None
+        return cls(BoundaryLayer.from_file(ward_path, ward_key, WARD_KEYS, 'wards') if ward_path else None,
+                   BoundaryLayer.from_file(zip_path, zip_key, ZIP_KEYS, 'zipcodes') if zip_path else None)
+
+    def layers(self):
+        """(column, layer) for each layer present"""
+        return [(column, layer) for column, layer in (('WARD', self.wards), ('ZIPCODE', self.zipcodes))
+                if layer is not None]
+
+    def version(self):
+        return tuple(layer.version() for _, layer in self.layers())
+
+
+@dataclass
+class JoinReport:
+    rows: int
+    backfilled: dict  # column -> rows whose missing value was assigned from boundaries
+    mismatches: dict  # column -> rows whose stored value disagrees with their coordinates
+    unassigned: dict  # column -> rows still missing after the join
+    seconds: float
+
+
+def spatial_join(df, boundaries):
+    """Backfill missing WARD/ZIPCODE from the boundaries and flag disagreeing stored values
+
+    df needs latitude/longitude. Returns (df, report): df gains WARD/ZIPCODE where they
+    were missing, a <column>_boundary column with the key from the boundaries (-1
+    outside all polygons) and a boolean <column>_mismatch column. Stored values are
+    kept; mismatches are flagged only.
+    """
+    start = time.perf_counter()
+    df = df.copy()
+    backfilled, mismatches, unassigned = {}, {}, {}
+    latitudes, longitudes = df['latitude'].to_numpy(), df['longitude'].to_numpy()
+
+    for column, layer in boundaries.layers():
+        with stage('spatial_join', layer=layer.name) as s:
+            assigned = layer.assign(latitudes, longitudes)
+            s.rows = len(assigned)
+
+        stored = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+        missing = np.isnan(stored)
+        fill = missing & (assigned >= 0)
+        df[column] = np.where(fill, assigned, stored)
+        df[f"{column}_boundary"] = assigned
+        df[f"{column}_mismatch"] = ~missing & (assigned >= 0) & (stored != assigned)
+
+        backfilled[column] = int(fill.sum())
+        mismatches[column] = int(df[f"{column}_mismatch"].sum())
+        unassigned[column] = int((missing & ~fill).sum())
+
+    return df, JoinReport(len(df), backfilled, mismatches, unassigned, time.perf_counter() - start)
+
+
+def print_join_report(report):
+    """Print backfill/mismatch counts per boundary layer"""
+    print("\n" + "=" * 50)
+    print("WARD / ZIP CODE SPATIAL JOIN")
+    print("=" * 50)
+    print(f"{report.rows} ATMs joined in {report.seconds:.2f}s")
+    for column in report.backfilled:
+        print(f"{column}: {report.backfilled[column]} backfilled, "
+              f"{report.mismatches[column]} disagree with their coordinates, "
+              f"{report.unassigned[column]} outside every boundary")
+
+
+def mismatch_rows(df):
+    """Rows whose stored WARD or ZIPCODE disagrees with the boundaries"""
+    flags = [column for column in ('WARD_mismatch', 'ZIPCODE_mismatch') if column in df.columns]
+    if not flags:
+        return df.iloc[:0]
+    columns = [column for column in ('OBJECTID', 'NAME', 'ADDRESS', 'latitude', 'longitude',
+                                     'WARD', 'WARD_boundary', 'ZIPCODE', 'ZIPCODE_boundary') if column in df.columns]
+    rows = df.loc[df[flags].any(axis=1), columns]
+    return rows.astype({column: 'Int64' for column in ('WARD', 'ZIPCODE') if column in rows.columns})
+
+
+def main():
+    """Check stored WARD/ZIPCODE against boundary files and report what a join would change"""
+    # Imported here so the analyzer can use this module without a circular import
+    from ATM_analyze import ATMDensityAnalyzer
+
+    parser = argparse.ArgumentParser(description="Assign WARD/ZIPCODE from boundary files and flag mismatches")
+    parser.add_argument("--wards", help="ward boundaries (GeoJSON or .shp)")
+    parser.add_argument("--zipcodes", help="ZIP code boundaries (GeoJSON or .shp)")
+    parser.add_argument("--ward-key", help="ward number property (default: first of %s)" % ', '.join(WARD_KEYS))
+    parser.add_argument("--zip-key", help="ZIP code property (default: first of %s)" % ', '.join(ZIP_KEYS))
+    parser.add_argument("--output", default="atm_boundary_mismatches.csv", help="CSV of mismatched rows")
+    args = parser.parse_args()
+
+    boundaries = Boundaries.from_files(args.wards, args.zipcodes, args.ward_key, args.zip_key)
+    if boundaries is None:
+        parser.error("give --wards and/or --zipcodes")
+
+    try:
+        analyzer = ATMDensityAnalyzer(boundaries=boundaries)
+        analyzer.load_data()
+        analyzer.convert_coordinates()
+        mismatches = analyzer.boundary_mismatches
+        mismatches.to_csv(args.output, index=False)
+        print(f"{len(mismatches)} mismatched ATMs written to '{args.output}'")
+    finally:
+        get_recorder().print_summary()
+        dispose_engines()
+
+
+if __name__ == "__main__":
+    main()
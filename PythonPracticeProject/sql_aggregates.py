@@ -0,0 +1,90 @@
+import pandas as pd
+from sqlalchemy import text
+
+# Rows the analyzer treats as live, valid ATMs (mirrors load_data + convert_coordinates)
+VALID_ROWS = "DELETED = 0 AND coord_valid = 1 AND WARD IS NOT NULL AND ZIPCODE IS NOT NULL"
+
+# Only the columns row-level reads actually use; X/Y/XCOORD/YCOORD let legacy rows be reprojected
+ROW_COLUMNS = ['OBJECTID', 'NAME', 'ADDRESS', 'ZIPCODE', 'WARD', 'X', 'Y', 'XCOORD', 'YCOORD',
+               'latitude', 'longitude', 'coord_valid']
+
+
+def cube_by(conn, table='ATM_DATA'):
+    """Count and coordinate sums per (WARD, ZIPCODE, NAME) in one GROUP BY, for AggregationCube.from_groups"""
+    query = f"""
+    SELECT WARD, ZIPCODE, NAME, COUNT(*) AS atm_count, SUM(latitude) AS lat_sum, SUM(longitude) AS lon_sum
+    FROM {table}
+    WHERE {VALID_ROWS}
+    GROUP BY WARD, ZIPCODE, NAME
+    """
+    return pd.read_sql(query, conn)
+
+
+def row_query(table='ATM_DATA', where=VALID_ROWS, columns=ROW_COLUMNS):
+    """SELECT of just the row-level columns the analyses need"""
+    return f"SELECT {', '.join(columns)} FROM {table} WHERE {where}"
+
+
+def address_rows(conn, table='ATM_DATA'):
+    """OBJECTID and ADDRESS of every live ATM, for loading the address table on demand"""
+    return pd.read_sql(row_query(table, where="DELETED = 0", columns=['OBJECTID', 'ADDRESS']), conn)
+
+
+def brand_rows(conn, name, table='ATM_DATA'):
+    """Row-level columns of one brand, looked up through the NAME index with a bound parameter"""
+    query = text(row_query(table, where="DELETED = 0 AND NAME = :name"))
+    return pd.read_sql(query, conn, params={'name': name})
+
+
+def all_brand_rows(conn, table='ATM_DATA'):
+    """Row-level columns of every live ATM in one query, for partitioning by NAME in memory"""
+    return pd.read_sql(row_query(table, where="DELETED = 0"), conn)
+
+
+def brand_counts(conn, table='ATM_DATA'):
+    """NAME and live ATM count of every brand, largest first"""
+    query = f"""
+    SELECT NAME, COUNT(*) as count
+    FROM {table}
+    WHERE DELETED = 0
+    GROUP BY NAME
+    ORDER BY count DESC, NAME
+    """
+    return pd.read_sql(query, conn)
+
+
+# Order-independent checksum of the rows' content hashes (ROW_CHECKSUM holds the high 32 bits
+# of ROW_HASH, which covers every source column, NAME and ADDRESS included)
+ROW_HASH_CHECKSUM = "SUM(ROW_CHECKSUM)"
+
+
+def brand_version(conn, name, table='ATM_DATA'):
+    """Cheap fingerprint of one brand's rows: count, max EDITED, OBJECTID, coordinate and row hash checksums"""
+    query = text(f"""
+    SELECT COUNT(*), MAX(EDITED), SUM(OBJECTID), SUM(latitude), SUM(longitude), {ROW_HASH_CHECKSUM}
+    FROM {table}
+    WHERE DELETED = 0 AND NAME = :name
+    """)
+    return tuple(str(value) for value in conn.execute(query, {'name': name}).one())
+
+
+def brand_versions(conn, table='ATM_DATA'):
+    """brand_version of every brand in one GROUP BY, as {NAME: fingerprint}"""
+    query = f"""
+    SELECT NAME, COUNT(*), MAX(EDITED), SUM(OBJECTID), SUM(latitude), SUM(longitude), {ROW_HASH_CHECKSUM}
+    FROM {table}
+    WHERE DELETED = 0
+    GROUP BY NAME
+    """
+    return {row[0]: tuple(str(value) for value in row[1:]) for row in conn.execute(text(query))}
+
+
+def dataset_version(conn, table='ATM_DATA', where=VALID_ROWS):
+    """Cheap fingerprint of the rows matching where: count, max EDITED, column and row hash checksums"""
+    query = text(f"""
+    SELECT COUNT(*), MAX(EDITED), SUM(OBJECTID), SUM(WARD), SUM(ZIPCODE), SUM(latitude), SUM(longitude),
+           {ROW_HASH_CHECKSUM}
+    FROM {table}
+    WHERE {where}
+    """)
+    return tuple(str(value) for value in conn.execute(query).one())
@@ -0,0 +1,98 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from projection import REFERENCE_CRS, SOURCE_CRS, TARGET_CRS, get_transformer
+
+# Brand mix roughly following ATM_Banking.csv: a few large networks and a long tail
+MAJOR_BRANDS = ['CVS(Allpoint)', 'Bank of America', 'Wells Fargo', '7-Eleven(Allpoint)', 'PNC',
+                'Capital One', 'SunTrust', 'Walgreens(Allpoint)', 'Citibank', 'TD Bank']
+
+# Ward centers (lat, lon), spread in degrees and their ZIP codes; ward 2 is the dense downtown core
+WARDS = {
+    1: ((38.9228, -77.0300), 0.010, [20001, 20009, 20010]),
+    2: ((38.9040, -77.0387), 0.012, [20005, 20006, 20036, 20037, 20004]),
+    3: ((38.9365, -77.0736), 0.018, [20008, 20015, 20016]),
+    4: ((38.9484, -77.0253), 0.016, [20011, 20012]),
+    5: ((38.9186, -76.9901), 0.015, [20017, 20018, 20002]),
+    6: ((38.8920, -77.0073), 0.011, [20002, 20003, 20024]),
+    7: ((38.8921, -76.9673), 0.016, [20019]),
+    8: ((38.8604, -76.9999), 0.015, [20020, 20032]),
+}
+WARD_WEIGHTS = np.array([34, 139, 18, 4, 14, 56, 5, 6], dtype=np.float64)
+
+
+def brand_names(n_brands):
+    """Major brands followed by generated long-tail names"""
+    tail = [f"Credit Union {i:04d}(Money Pass)" for i in range(max(0, n_brands - len(MAJOR_BRANDS)))]
+    return (MAJOR_BRANDS + tail)[:n_brands]
+
+
+def generate_atms(n, n_brands=100, clusters_per_ward=6, seed=0):
+    """Generate a realistic synthetic ATM_Banking table with n rows
+
+    ATMs are drawn from Gaussian clusters inside each ward (commercial corridors), wards are
+    weighted like the real data, brands follow a Zipf-like distribution and every row
+    carries a ZIP code of its ward. Columns match ATM_Banking.csv / schema.sql.
+    """
+    rng = np.random.default_rng(seed)
+    ward_ids = np.array(list(WARDS))
+
+    wards = rng.choice(ward_ids, size=n, p=WARD_WEIGHTS / WARD_WEIGHTS.sum())
+    latitudes = np.empty(n)
+    longitudes = np.empty(n)
+    zipcodes = np.empty(n, dtype=np.int64)
+
+    for ward in ward_ids:
+        (lat, lon), spread, zips = WARDS[ward]
+        rows = np.flatnonzero(wards == ward)
+        centers = np.column_stack((lat + rng.normal(0, spread, clusters_per_ward),
+                                   lon + rng.normal(0, spread, clusters_per_ward)))
+        cluster = rng.integers(0, clusters_per_ward, size=len(rows))
+        latitudes[rows] = centers[cluster, 0] + rng.normal(0, spread / 4, len(rows))
+        longitudes[rows] = centers[cluster, 1] + rng.normal(0, spread / 4, len(rows))
+        zipcodes[rows] = rng.choice(zips, size=len(rows))
+
+    names = np.array(brand_names(n_brands))
+    brand_weights = 1.0 / np.arange(1, len(names) + 1) ** 1.1
+    brands = names[rng.choice(len(names), size=n, p=brand_weights / brand_weights.sum())]
+
+    # X/Y in Web Mercator and XCOORD/YCOORD in State Plane, like the published feed
+    x, y = get_transformer(TARGET_CRS, SOURCE_CRS).transform(longitudes, latitudes)
+    xcoord, ycoord = get_transformer(TARGET_CRS, REFERENCE_CRS).transform(longitudes, latitudes)
+    objectids = np.arange(1, n + 1)
+    return pd.DataFrame({
+        'X': x,
+        'Y': y,
+        'NAME': brands,
+        'ADDRESS': [f"{number} SYNTHETIC STREET NW" for number in rng.integers(100, 9999, size=n)],
+        'ZIPCODE': zipcodes,
+        'WARD': wards,
+        'ID': objectids,
+        'MAR_ID': rng.integers(200000, 400000, size=n),
+        'XCOORD': xcoord.round(2),
+        'YCOORD': ycoord.round(2),
+        'GIS_ID': [f"temp_{i}" for i in objectids],
+        'CREATOR': None,
+        'CREATED': None,
+        'EDITOR': None,
+        'EDITED': None,
+        'GLOBALID': [f"{{{i:08X}-0000-4000-8000-000000000000}}" for i in objectids],
+        'OBJECTID': objectids,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic ATM_Banking-style CSV")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_atms(args.rows, seed=args.seed).to_csv(args.output, index=False)
+    print(f"Wrote {args.rows} synthetic ATMs to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# The project modules are flat scripts imported by bare name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """SQLAlchemy engine over a SQLite stand-in of ATM_DATA holding 200 synthetic ATMs"""
+    from sqlalchemy import create_engine
+
+    from bulk_loader import bulk_load
+    from schema_manager import read_schema_commands
+    from synthetic_data import generate_atms
+
+    db_path = tmp_path / 'atm.db'
+    conn = sqlite3.connect(db_path)
+    for cmd in read_schema_commands():
+        conn.execute(cmd)
+    csv_path = tmp_path / 'atm.csv'
+    generate_atms(200, n_brands=5, seed=2).to_csv(csv_path, index=False)
+    bulk_load(conn, str(csv_path))
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    yield engine
+    engine.dispose()
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from aggregation_cube import AggregationCube
+
+
+def make_frame(n, wards, zipcodes, names, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'WARD': rng.integers(0, wards, n),
+        'ZIPCODE': 20000 + rng.integers(0, zipcodes, n),
+        'NAME': np.array([f"Brand {i:06d}" for i in range(names)], dtype=object)[rng.integers(0, names, n)],
+        'latitude': 38.9 + rng.random(n) * 0.1,
+        'longitude': -77.0 + rng.random(n) * 0.1,
+    })
+
+
+def test_roll_up_matches_groupby():
+    df = make_frame(2000, 8, 20, 30)
+    cube = AggregationCube.from_frame(df)
+    assert cube.total == len(df)
+
+    result = cube.roll_up('WARD', 'NAME')
+    expected = df.groupby(['WARD', 'NAME']).agg(
+        atm_count=('latitude', 'size'), latitude=('latitude', 'mean'), longitude=('longitude', 'mean')).reset_index()
+    assert result['atm_count'].tolist() == expected['atm_count'].tolist()
+    assert result['NAME'].tolist() == expected['NAME'].tolist()
+    np.testing.assert_allclose(result['latitude'], expected['latitude'])
+
+    table = cube.crosstab('ZIPCODE')
+    expected = df.groupby(['ZIPCODE', 'NAME']).size().unstack(fill_value=0)
+    assert table.values.tolist() == expected.values.tolist()
+    assert table.columns.tolist() == expected.columns.tolist()
+
+
+def test_sparse_key_space():
+    # 50k x 50k x 50k possible cells: a dense cube would need ~10^14 slots
+    df = make_frame(50000, 50000, 50000, 50000)
+    cube = AggregationCube.from_frame(df)
+    assert len(cube.count) <= len(df)
+    assert cube.total == len(df)
+    assert cube.roll_up('WARD')['atm_count'].sum() == len(df)
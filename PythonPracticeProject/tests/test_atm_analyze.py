@@ -0,0 +1,61 @@
+import json
+
+import shapely
+
+from ATM_analyze import ATMDensityAnalyzer
+from data_sources import MySQLSource, SnapshotSource, write_snapshot
+from spatial_join import Boundaries
+
+
+def insert_missing_ward_atm(conn):
+    """Copy of ATM 1 under a new OBJECTID with no WARD, as the spatial join would backfill it"""
+    columns = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(ATM_DATA)") if row[1] != 'OBJECTID']
+    conn.exec_driver_sql(f"INSERT INTO ATM_DATA (OBJECTID, {', '.join(columns)}) "
+                         f"SELECT 100000, {', '.join(columns)} FROM ATM_DATA WHERE OBJECTID = 1")
+    conn.exec_driver_sql("UPDATE ATM_DATA SET WARD = NULL WHERE OBJECTID = 100000")
+
+
+def write_ward_boundary(tmp_path):
+    """One ward covering all the synthetic ATMs"""
+    ward_path = tmp_path / 'wards.geojson'
+    ward_path.write_text(json.dumps({'type': 'FeatureCollection', 'features': [{
+        'type': 'Feature', 'properties': {'WARD': 1},
+        'geometry': json.loads(shapely.to_geojson(shapely.box(-78, 38, -76, 40)))}]}))
+    return Boundaries.from_files(str(ward_path))
+
+
+def test_dataset_version_covers_rows_loaded_for_the_join(engine, tmp_path):
+    joined = ATMDensityAnalyzer(engine=engine, boundaries=write_ward_boundary(tmp_path))
+    plain = ATMDensityAnalyzer(engine=engine)
+
+    before = joined.dataset_version(), plain.dataset_version()
+    with engine.begin() as conn:
+        insert_missing_ward_atm(conn)
+    after = joined.dataset_version(), plain.dataset_version()
+
+    # The joined analysis reads the new row, the plain one skips it
+    assert after[0] != before[0]
+    assert after[1] == before[1]
+
+    joined.load_data()
+    assert 100000 in joined.df['OBJECTID'].values
+
+
+def test_snapshot_keeps_missing_ward_rows_for_the_join(engine, tmp_path):
+    with engine.begin() as conn:
+        insert_missing_ward_atm(conn)
+        conn.exec_driver_sql("UPDATE ATM_DATA SET WARD = 200 WHERE OBJECTID = 2")
+    write_snapshot(MySQLSource(engine).load(), str(tmp_path / 'snap'))
+
+    joined = ATMDensityAnalyzer(source=SnapshotSource(str(tmp_path / 'snap')), boundaries=write_ward_boundary(tmp_path))
+    joined.load_data()
+    joined.convert_coordinates()
+    assert joined.join_report.backfilled['WARD'] == 1
+    assert 100000 in joined.df['OBJECTID'].values
+
+    plain = ATMDensityAnalyzer(source=SnapshotSource(str(tmp_path / 'snap')))
+    plain.load_data()
+    plain.convert_coordinates()
+    assert 100000 not in plain.df['OBJECTID'].values
+    # Wards above the int8 range survive the snapshot
+    assert plain.df.loc[plain.df['OBJECTID'] == 2, 'WARD'].item() == 200
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+from atm_coverage import analyze_coverage, ward_coverage_stats
+from spatial_join import Boundaries, BoundaryLayer
+
+
+def make_atms():
+    return pd.DataFrame({'NAME': ['A', 'B', 'A', 'B'], 'WARD': [1, 1, 2, 2],
+                         'latitude': [38.900, 38.905, 38.900, 38.905],
+                         'longitude': [-77.030, -77.025, -77.010, -77.005]})
+
+
+def test_area_buffer_limits_study_area():
+    result = analyze_coverage(make_atms(), cell_m=100, area_km=0.5)
+    assert result.distance_km[result.in_area].max() <= 0.5
+    assert set(np.unique(result.ward[result.in_area])) == {1, 2}
+
+
+def test_ward_boundaries_clip_grid():
+    wards = BoundaryLayer('wards', np.array([shapely.box(-77.04, 38.89, -77.02, 38.91),
+                                             shapely.box(-77.02, 38.89, -77.00, 38.91)]), np.array([7, 8]))
+    result = analyze_coverage(make_atms(), cell_m=100, boundaries=Boundaries(wards=wards))
+
+    latitudes, longitudes = result.grid.cell_centers(0, result.grid.size)
+    inside = (latitudes > 38.89) & (latitudes < 38.91) & (longitudes > -77.04) & (longitudes < -77.00)
+    assert np.array_equal(result.in_area.ravel(), inside)
+    assert set(np.unique(result.ward[result.in_area])) == {7, 8}
+    assert ward_coverage_stats(result)['area_km2'].sum() < 8.0
@@ -0,0 +1,31 @@
+import sqlite3
+
+import pytest
+
+from bulk_loader import TABLE_COLUMNS, insert_statement, placeholder_for
+
+
+def test_placeholder_for_sqlite3():
+    conn = sqlite3.connect(':memory:')
+    try:
+        assert placeholder_for(conn) == '?'
+    finally:
+        conn.close()
+
+
+def test_placeholder_for_mysql_connector():
+    connection = pytest.importorskip('mysql.connector.connection')
+    # The class lives in mysql.connector.connection; paramstyle is on mysql.connector
+    conn = connection.MySQLConnection()
+    assert placeholder_for(conn) == '%s'
+
+
+def test_placeholder_for_unknown_driver():
+    with pytest.raises(ValueError):
+        placeholder_for(object())
+
+
+def test_insert_statement_uses_placeholder():
+    statement = insert_statement('ATM_DATA', TABLE_COLUMNS, '%s')
+    assert statement.count('%s') == len(TABLE_COLUMNS)
+    assert '?' not in statement
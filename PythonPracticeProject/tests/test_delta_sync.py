@@ -0,0 +1,47 @@
+import sqlite3
+
+import pytest
+
+from bulk_loader import TABLE_COLUMNS
+from delta_sync import sync_csv, upsert_statement
+from schema_manager import read_schema_commands
+from synthetic_data import generate_atms
+
+
+def test_upsert_statement_mysql_connector():
+    connection = pytest.importorskip('mysql.connector.connection')
+    statement = upsert_statement('ATM_DATA', TABLE_COLUMNS, connection.MySQLConnection())
+    assert statement.count('%s') == len(TABLE_COLUMNS)
+    assert 'ON DUPLICATE KEY UPDATE' in statement
+    assert 'ON CONFLICT' not in statement
+
+
+def test_upsert_statement_sqlite3():
+    statement = upsert_statement('ATM_DATA', TABLE_COLUMNS, sqlite3.connect(':memory:'))
+    assert statement.count('?') == len(TABLE_COLUMNS)
+    assert 'ON CONFLICT(OBJECTID) DO UPDATE' in statement
+
+
+def test_sync_csv_sqlite3(tmp_path):
+    conn = sqlite3.connect(':memory:')
+    for cmd in read_schema_commands():
+        conn.execute(cmd)
+
+    df = generate_atms(50, seed=1)
+    csv_path = tmp_path / 'atm.csv'
+    df.to_csv(csv_path, index=False)
+    report = sync_csv(conn, str(csv_path))
+    assert (report.inserted, report.updated, report.deleted) == (50, 0, 0)
+
+    # Unchanged source: nothing is rewritten
+    assert sync_csv(conn, str(csv_path)).changed == 0
+
+    # One edited row and one row dropped from the source
+    df.loc[0, 'ADDRESS'] = '1 CHANGED STREET NW'
+    df.iloc[:-1].to_csv(csv_path, index=False)
+    report = sync_csv(conn, str(csv_path))
+    assert (report.inserted, report.updated, report.deleted, report.unchanged) == (0, 1, 1, 48)
+
+    deleted = conn.execute("SELECT OBJECTID FROM ATM_DATA WHERE DELETED = 1").fetchall()
+    assert deleted == [(int(df['OBJECTID'].iloc[-1]),)]
+    conn.close()
@@ -0,0 +1,48 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import ATM_analyze
+from ATM_analyze import ATMDensityAnalyzer
+from density_tiles import DEFAULT_ZOOM_LEVELS, EMBEDDED_ZOOM_LEVELS, build_density_tiles
+
+
+def make_analyzer(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    analyzer = ATMDensityAnalyzer.__new__(ATMDensityAnalyzer)
+    analyzer.df = pd.DataFrame({'latitude': 38.85 + rng.random(n) * 0.1, 'longitude': -77.05 + rng.random(n) * 0.1,
+                                'WARD': rng.integers(1, 9, n), 'ZIPCODE': 20001 + rng.integers(0, 5, n)})
+    ward_stats = analyzer.df.groupby('WARD').size().rename('atm_count').reset_index()
+    return analyzer, ward_stats
+
+
+def test_tiles_cover_every_atm_at_each_zoom():
+    analyzer, _ = make_analyzer()
+    tiles = build_density_tiles(analyzer.df['latitude'], analyzer.df['longitude'])
+    for zoom in DEFAULT_ZOOM_LEVELS:
+        assert sum(cell[2] for cells in tiles[zoom].values() for cell in cells) == len(analyzer.df)
+
+
+def test_embedded_tiles_stop_at_low_zoom(tmp_path, monkeypatch):
+    monkeypatch.setattr(ATM_analyze, 'HEATMAP_FILE', str(tmp_path / 'map.html'))
+    analyzer, ward_stats = make_analyzer()
+    analyzer.create_density_heatmap(ward_stats, None, render_mode='tiles')
+
+    html = (tmp_path / 'map.html').read_text()
+    embedded = json.loads(html.split('var embedded = ')[1].split(';\n')[0])
+    assert sorted(map(int, embedded)) == list(EMBEDDED_ZOOM_LEVELS)
+
+
+def test_tiles_dir_is_written_and_fetched(tmp_path, monkeypatch):
+    monkeypatch.setattr(ATM_analyze, 'HEATMAP_FILE', str(tmp_path / 'map.html'))
+    analyzer, ward_stats = make_analyzer()
+    analyzer.create_density_heatmap(ward_stats, None, render_mode='tiles', tiles_dir=str(tmp_path / 'tiles'))
+
+    html = (tmp_path / 'map.html').read_text()
+    assert 'var embedded = null' in html
+    assert 'var baseUrl = "tiles"' in html
+    index = json.loads((tmp_path / 'tiles' / 'index.json').read_text())
+    assert sorted(map(int, index['levels'])) == list(DEFAULT_ZOOM_LEVELS)
+    assert os.path.isdir(tmp_path / 'tiles' / str(max(DEFAULT_ZOOM_LEVELS)))
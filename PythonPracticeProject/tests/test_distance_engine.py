@@ -0,0 +1,55 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from distance_engine import EARTH_RADIUS_KM, pairwise_distance_stats
+
+try:
+    from geopy.distance import great_circle
+
+    def reference_km(lat1, lon1, lat2, lon2):
+        return great_circle((lat1, lon1), (lat2, lon2)).km
+except ImportError:
+    def reference_km(lat1, lon1, lat2, lon2):
+        # Plain haversine, independent of the atan2 form used by distance_engine
+        phi1, phi2 = math.radians(lat1), math.radians(lat2)
+        a = (math.sin((phi2 - phi1) / 2) ** 2 +
+             math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def random_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return 38.8 + rng.random(n) * 0.2, -77.1 + rng.random(n) * 0.2
+
+
+def test_pair_distance_matches_reference():
+    # Identical, nearby, intercontinental and near-antipodal pairs
+    points = [(38.9, -77.03), (38.9, -77.03), (38.9001, -77.0301), (51.5, -0.12), (-33.9, 151.2), (-38.9, 102.97)]
+    for (lat1, lon1), (lat2, lon2) in itertools.product(points, repeat=2):
+        stats = pairwise_distance_stats([lat1, lat2], [lon1, lon2])
+        assert stats.shortest == pytest.approx(reference_km(lat1, lon1, lat2, lon2), rel=1e-9, abs=1e-6)
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 256])
+def test_pairwise_distance_stats_matches_reference(block_size):
+    latitudes, longitudes = random_points(60)
+    distances = {(i, j): reference_km(latitudes[i], longitudes[i], latitudes[j], longitudes[j])
+                 for i, j in itertools.combinations(range(len(latitudes)), 2)}
+    nearest = [min(d for pair, d in distances.items() if i in pair) for i in range(len(latitudes))]
+
+    stats = pairwise_distance_stats(latitudes, longitudes, block_size=block_size)
+    assert stats.count == len(distances)
+    assert stats.shortest == pytest.approx(min(distances.values()), rel=1e-9)
+    assert stats.farthest == pytest.approx(max(distances.values()), rel=1e-9)
+    assert stats.average == pytest.approx(sum(distances.values()) / len(distances), rel=1e-9)
+    np.testing.assert_allclose(stats.nearest, nearest, rtol=1e-9)
+
+
+def test_pairwise_distance_stats_single_point():
+    stats = pairwise_distance_stats([38.9], [-77.03])
+    assert stats.count == 0
+    assert math.isnan(stats.average)
+    assert stats.nearest.tolist() == [math.inf]
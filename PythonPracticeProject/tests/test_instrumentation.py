@@ -0,0 +1,32 @@
+import sys
+
+import instrumentation
+from instrumentation import StageRecorder
+
+
+def run_stages():
+    recorder = StageRecorder()
+    with recorder.stage('load') as s:
+        s.rows = 3
+    return recorder
+
+
+def test_stage_records_rss():
+    record = run_stages().records[0]
+    if instrumentation.resource is not None:
+        assert record.max_rss_mb > 0
+        assert record.rss_growth_mb >= 0
+
+
+def test_stage_without_resource_module(monkeypatch, capsys):
+    # As on Windows without psutil
+    monkeypatch.setattr(instrumentation, 'resource', None)
+    monkeypatch.setitem(sys.modules, 'psutil', None)
+    assert instrumentation.max_rss_mb() is None
+
+    recorder = run_stages()
+    assert recorder.records[0].max_rss_mb is None
+    assert recorder.records[0].rows == 3
+    recorder.print_summary()
+    output = capsys.readouterr().out
+    assert 'load' in output and 'RSS' not in output
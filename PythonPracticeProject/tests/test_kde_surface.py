@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from kde_surface import gaussian_kernel, kernel_density
+
+
+def test_density_integrates_to_point_count():
+    rng = np.random.default_rng(0)
+    latitudes, longitudes = 38.9 + rng.normal(0, 0.01, 300), -77.03 + rng.normal(0, 0.01, 300)
+    surface = kernel_density(latitudes, longitudes, cell_m=50)
+    assert surface.density.sum() * (surface.grid.cell_m / 1000) ** 2 == pytest.approx(300, rel=1e-3)
+
+
+def test_large_extent_is_coarsened():
+    # Points 4000 km apart would need ~10^10 cells of 50 m
+    surface = kernel_density([25.0, 49.0, 30.0], [-124.0, -67.0, -90.0], bandwidth_m=20000, max_cells=1_000_000)
+    assert surface.grid.size <= 1_000_000
+    assert surface.grid.cell_m > 50
+
+
+@pytest.mark.parametrize('latitudes, longitudes', [([38.9], [-77.03]), ([38.9, 38.9], [-77.03, -77.03])])
+def test_zero_scott_bandwidth_is_rejected(latitudes, longitudes):
+    with pytest.raises(ValueError, match="bandwidth"):
+        kernel_density(latitudes, longitudes)
+
+
+def test_bad_bandwidth_and_cell_size_are_rejected():
+    with pytest.raises(ValueError):
+        kernel_density([38.9, 38.91], [-77.03, -77.02], bandwidth_m=0)
+    with pytest.raises(ValueError):
+        kernel_density([38.9, 38.91], [-77.03, -77.02], cell_m=0)
+    with pytest.raises(ValueError):
+        gaussian_kernel(0.0)
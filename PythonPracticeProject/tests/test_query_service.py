@@ -0,0 +1,23 @@
+import pytest
+
+from query_service import ATMQueryService, BadRequest
+
+POINTS = [[38.9, -77.03]]
+
+
+@pytest.fixture
+def service():
+    # Validation happens before any state is read, so no data needs loading
+    return ATMQueryService.__new__(ATMQueryService)
+
+
+@pytest.mark.parametrize('k', ['abc', None, [1], 0, 10 ** 6, 2.7, True, '2.5', float('nan'), float('inf')])
+def test_nearest_rejects_bad_k(service, k):
+    with pytest.raises(BadRequest):
+        service.nearest({'points': POINTS, 'k': k})
+
+
+@pytest.mark.parametrize('radius_km', ['abc', None, -1, float('nan'), float('inf'), '-0.5'])
+def test_within_rejects_bad_radius(service, radius_km):
+    with pytest.raises(BadRequest):
+        service.within({'points': POINTS, 'radius_km': radius_km})
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from spatial_index import ATMSpatialIndex
+
+
+@pytest.fixture
+def index():
+    df = pd.DataFrame({'NAME': ['A', 'B', 'A'], 'WARD': [1, 2, 2], 'ZIPCODE': [20001, 20002, 20002],
+                       'latitude': [38.90, 38.91, 38.92], 'longitude': [-77.03, -77.02, -77.01]})
+    return ATMSpatialIndex(df)
+
+
+def test_knn_rejects_k_below_one(index):
+    with pytest.raises(ValueError):
+        index.knn(38.9, -77.0, k=0)
+
+
+@pytest.mark.parametrize('radius_km', [-0.5, np.nan, np.inf])
+def test_within_radius_rejects_bad_radius(index, radius_km):
+    with pytest.raises(ValueError):
+        index.within_radius(38.9, -77.0, radius_km)
+
+
+def test_within_radius_zero_radius(index):
+    (positions, distances), = index.within_radius(38.90, -77.03, 0.0)
+    assert positions.tolist() == [0]
+    assert distances[0] == pytest.approx(0.0, abs=1e-9)
+
+
+def test_filtered_trees_are_bounded(index):
+    index.max_trees = 4
+    for ward in range(20):
+        index.knn(38.9, -77.0, k=1, ward=[ward, ward + 1])
+    assert len(index._trees) == 4
+
+    # Results do not depend on whether the sub-tree was cached
+    distances, positions = index.knn(38.9, -77.0, k=2, name='A')
+    assert sorted(positions[0].tolist()) == [0, 2]
+    assert index.knn(38.9, -77.0, k=2, name='A')[1].tolist() == positions.tolist()
@@ -0,0 +1,26 @@
+from sql_aggregates import ROW_HASH_CHECKSUM, brand_version, brand_versions, dataset_version
+
+
+def test_row_checksum_matches_row_hash(engine):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT ROW_HASH, ROW_CHECKSUM FROM ATM_DATA").all()
+        total = int(conn.exec_driver_sql(f"SELECT {ROW_HASH_CHECKSUM} FROM ATM_DATA").scalar())
+    assert all(checksum == int(row_hash[:8], 16) for row_hash, checksum in rows)
+    assert total == sum(checksum for _, checksum in rows)
+
+
+def test_versions_change_with_name_or_address(engine):
+    with engine.begin() as conn:
+        name = conn.exec_driver_sql("SELECT NAME FROM ATM_DATA WHERE OBJECTID = 1").scalar()
+        before = dataset_version(conn), brand_version(conn, name), brand_versions(conn)
+        assert before[2][name] == before[1]
+
+        conn.exec_driver_sql("UPDATE ATM_DATA SET ADDRESS = '1 CHANGED ST NW', "
+                             "ROW_HASH = '0123456789abcdef', ROW_CHECKSUM = 19088743 WHERE OBJECTID = 1")
+        after = dataset_version(conn), brand_version(conn, name), brand_versions(conn)
+
+    assert after[0] != before[0]
+    assert after[1] != before[1]
+    assert after[2][name] == after[1]
+    assert {key: value for key, value in after[2].items() if key != name} == \
+        {key: value for key, value in before[2].items() if key != name}
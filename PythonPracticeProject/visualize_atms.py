@@ -1,82 +1,147 @@
+import argparse
+import contextlib
+import html
+import io
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
-from database_config import MYSQLConfig
+from engine_factory import connection, dispose_engines, get_engine, print_checkout_metrics
 import folium
-from geopy.distance import great_circle
-import numpy as np
-from pyproj import Transformer
+from sql_aggregates import all_brand_rows, brand_counts, brand_rows, brand_version, brand_versions
+from distance_engine import pairwise_distance_stats, print_distance_stats
+from projection import ensure_wgs84
+from instrumentation import get_recorder, stage
+from result_cache import ResultCache
+
+
+@dataclass
+class BrandResult:
+    df: pd.DataFrame  # valid ATMs with latitude/longitude (and nearest_atm_km)
+    stats: object  # DistanceStats, or None with fewer than two ATMs
+    map_html: str
+    filename: str
+
+
+@dataclass
+class BrandSummary:
+    name: str
+    atms: int
+    filename: str = None  # None when the brand had no valid coordinates
+    shortest_km: float = None
+    farthest_km: float = None
+    average_km: float = None
+    mean_nearest_km: float = None
+    seconds: float = 0.0
+
+
+class BrandCache:
+    """In-process LRU cache of per-brand results keyed by (brand, data version)
+
+    With a ResultCache as store, results also persist on disk, so a later run
+    reuses every brand whose rows have not changed since.
+    """
+
+    def __init__(self, max_entries=32, store=None):
+        self.max_entries = max_entries
+        self.store = store
+        self._entries = OrderedDict()
+
+    def get(self, name, version):
+        key = (name, version)
+        if key not in self._entries:
+            result = self.store.get(('brand', name), version) if self.store is not None else None
+            if result is not None:
+                self._remember(name, version, result)
+            return result
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, name, version, result):
+        self._remember(name, version, result)
+        if self.store is not None:
+            self.store.put(('brand', name), version, result)
+
+    def _remember(self, name, version, result):
+        # Drop stale versions of this brand before inserting the fresh one
+        for key in [key for key in self._entries if key[0] == name]:
+            del self._entries[key]
+        self._entries[(name, version)] = result
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def save_map_html(filename, html):
+    """Write a rendered map to disk"""
+    with open(filename, 'w', encoding='utf-8') as file:
+        file.write(html)
+    print(f"\nMap saved as '{filename}'. Open it in a browser to view.")
 
 
 def get_all_atm_names():
     """Fetch and display all unique ATM names from the database"""
-    # Initialize MYSQLConfig
-    config = MYSQLConfig(
-        host='localhost',
-        port=3306,
-        user='root',
-        password='123',
-        table='ATM_DATA',
-        database='ATM_DATA'
-    )
-
-    # Create SQLAlchemy engine
-    url = f"mysql+mysqlconnector://{config.user}:{config.password}@{config.host}:{config.port}/{config.database}"
-    engine = create_engine(url)
+    # Shared pooled engine, configured from ATM_DB_* environment variables
+    engine = get_engine()
 
     # Fetch all unique ATM names with counts
-    query = """
-    SELECT NAME, COUNT(*) as count 
-    FROM ATM_DATA 
-    GROUP BY NAME 
-    ORDER BY count DESC, NAME
-    """
-    df = pd.read_sql(query, engine)
+    with connection(engine) as conn:
+        df = brand_counts(conn)
 
     print("Available ATM Names:")
     print("-" * 50)
-    for idx, row in df.iterrows():
-        print(f"{idx + 1:2d}. {row['NAME']} ({row['count']} locations)")
+    for idx, (name, count) in enumerate(zip(df['NAME'], df['count'])):
+        print(f"{idx + 1:2d}. {name} ({count} locations)")
 
     return df, engine
 
 
-def visualize_and_calculate_distances(atm_name, engine):
-    """Create map and calculate distances for specified ATM name"""
+def visualize_and_calculate_distances(atm_name, engine, cache=None):
+    """Create map and calculate distances for specified ATM name
+
+    With a BrandCache, a repeat selection whose data version is unchanged reuses the
+    projected coordinates, distance statistics and rendered map without refetching rows.
+    """
+    with stage('visualize_brand', brand=atm_name) as s:
+        result = _visualize_brand(atm_name, engine, cache)
+        s.rows = len(result.df) if result is not None else 0
+    return result
+
+
+def map_filename(atm_name):
+    """HTML file name for a brand's map"""
+    return f"{atm_name.replace('/', '_').replace(' ', '_').lower()}_atm_map.html"
 
-    # Fetch all ATM data for the specified name
-    # Escape single quotes in the name to prevent SQL issues
-    escaped_name = atm_name.replace("'", "''")
-    query = f"SELECT * FROM ATM_DATA WHERE NAME = '{escaped_name}'"
-    df = pd.read_sql(query, engine)
 
+def build_brand_result(atm_name, df):
+    """Project, compute distance statistics and render the map for one brand's rows
+
+    Pure function of the rows (no database access), shared by the interactive mapper and
+    the batch workers. Returns None when there is nothing to map.
+    """
     print(f"\nFound {len(df)} '{atm_name}' ATMs.")
 
     if len(df) == 0:
         print("No matching ATMs found.")
         return
 
-    # Check coordinate ranges to confirm projection
-    print("\nCoordinate ranges before conversion:")
-    print(df[['X', 'Y']].describe())
-
-    # Convert coordinates from NAD83 State Plane Maryland FIPS 1900 (EPSG:2893) to WGS84 (EPSG:4326)
-    transformer = Transformer.from_crs("EPSG:2893", "EPSG:4326", always_xy=True)
-    df['longitude'], df['latitude'] = transformer.transform(df['X'].values, df['Y'].values)
+    # Use the latitude/longitude stored at ingest (projects X/Y only for legacy tables)
+    df, valid_coords = ensure_wgs84(df)
 
     # Verify converted coordinates
-    print("\nConverted coordinate ranges (latitude/longitude):")
+    print("\nCoordinate ranges (latitude/longitude):")
     print(df[['latitude', 'longitude']].describe())
 
     # Check for invalid coordinates
-    invalid_coords = df[df['latitude'].isna() | df['longitude'].isna() |
-                        (df['latitude'] < -90) | (df['latitude'] > 90) |
-                        (df['longitude'] < -180) | (df['longitude'] > 180)]
+    invalid_coords = df[~valid_coords]
     if not invalid_coords.empty:
         print(f"Warning: Found {len(invalid_coords)} invalid coordinates:")
         print(invalid_coords[['NAME', 'ADDRESS', 'X', 'Y']])
         # Filter out invalid coordinates
-        df = df[df['latitude'].notna() & df['longitude'].notna() &
-                (df['latitude'].between(-90, 90)) & (df['longitude'].between(-180, 180))]
+        df = df[valid_coords]
 
     if len(df) < 2:
         print("Not enough valid ATMs to calculate distances.")
@@ -85,27 +150,16 @@ def visualize_and_calculate_distances(atm_name, engine):
         else:
             return
 
-    # Calculate pairwise distances (in km) using Haversine formula
+    # Calculate pairwise distance statistics (in km) with the vectorized block engine
+    stats = None
     if len(df) >= 2:
-        coords = df[['latitude', 'longitude']].values  # [lat, lon] for great_circle
-        distances = []
-        for i in range(len(coords)):
-            for j in range(i + 1, len(coords)):
-                try:
-                    dist = great_circle(coords[i], coords[j]).km
-                    distances.append(dist)
-                except ValueError as e:
-                    print(f"Error calculating distance between points {i} and {j}: {e}")
-                    continue
-
-        if distances:
-            shortest_dist = min(distances)
-            farthest_dist = max(distances)
-            avg_dist = np.mean(distances)
-            print(f"\nDistance Statistics:")
-            print(f"Shortest distance between ATMs: {shortest_dist:.2f} km ({shortest_dist * 0.621371:.2f} miles)")
-            print(f"Farthest distance between ATMs: {farthest_dist:.2f} km ({farthest_dist * 0.621371:.2f} miles)")
-            print(f"Average distance between ATMs: {avg_dist:.2f} km ({avg_dist * 0.621371:.2f} miles)")
+        with stage('distance') as s:
+            stats = pairwise_distance_stats(df['latitude'].values, df['longitude'].values)
+            s.rows = len(df)
+        df = df.assign(nearest_atm_km=stats.nearest)
+
+        if stats.count:
+            print_distance_stats(stats)
         else:
             print("No valid distances calculated.")
 
@@ -128,21 +182,209 @@ def visualize_and_calculate_distances(atm_name, engine):
 
     atm_map = folium.Map(location=map_center, zoom_start=zoom_start)
 
-    # Add markers for each ATM
-    for idx, row in df.iterrows():
-        if pd.notnull(row['latitude']) and pd.notnull(row['longitude']):
-            folium.Marker(
-                location=[row['latitude'], row['longitude']],
-                popup=f"<b>{row['NAME']}</b><br>{row['ADDRESS']}<br>ZIP: {row['ZIPCODE']}<br>Ward: {row['WARD']}",
-                icon=folium.Icon(color='blue', icon='university', prefix='fa')
-            ).add_to(atm_map)
-
-    # Create filename based on ATM name
-    filename = f"{atm_name.replace('/', '_').replace(' ', '_').lower()}_atm_map.html"
+    with stage('markers') as s:
+        # Add markers for each ATM
+        for idx, row in df.iterrows():
+            if pd.notnull(row['latitude']) and pd.notnull(row['longitude']):
+                popup = f"<b>{row['NAME']}</b><br>{row['ADDRESS']}<br>ZIP: {row['ZIPCODE']}<br>Ward: {row['WARD']}"
+                if 'nearest_atm_km' in row:
+                    popup += f"<br>Nearest {row['NAME']}: {row['nearest_atm_km']:.2f} km"
+                folium.Marker(
+                    location=[row['latitude'], row['longitude']],
+                    popup=popup,
+                    icon=folium.Icon(color='blue', icon='university', prefix='fa')
+                ).add_to(atm_map)
+        s.rows = len(df)
+
+    with stage('render_html'):
+        return BrandResult(df, stats, atm_map.get_root().render(), map_filename(atm_name))
+
+
+def _visualize_brand(atm_name, engine, cache):
+    with stage('fetch') as s, connection(engine) as conn:
+        version = brand_version(conn, atm_name) if cache is not None else None
+        cached = cache.get(atm_name, version) if cache is not None else None
+
+        # Fetch all ATM data for the specified name (bound parameter over the NAME index)
+        if cached is None:
+            df = brand_rows(conn, atm_name)
+            s.rows = len(df)
+
+    if cached is not None:
+        print(f"\nFound {len(cached.df)} '{atm_name}' ATMs (cached, data unchanged).")
+        if cached.stats is not None and cached.stats.count:
+            print_distance_stats(cached.stats)
+        save_map_html(cached.filename, cached.map_html)
+        return cached
+
+    result = build_brand_result(atm_name, df)
+    if result is None:
+        return
 
     # Save the map to an HTML file
-    atm_map.save(filename)
-    print(f"\nMap saved as '{filename}'. Open it in a browser to view.")
+    save_map_html(result.filename, result.map_html)
+
+    if cache is not None:
+        cache.put(atm_name, version, result)
+    return result
+
+
+def summarize_brand(atm_name, result, seconds=0.0):
+    """BrandSummary row of one brand's result (None when it had no valid coordinates)"""
+    if result is None:
+        return BrandSummary(atm_name, 0, seconds=seconds)
+
+    summary = BrandSummary(atm_name, len(result.df), result.filename, seconds=seconds)
+    if result.stats is not None and result.stats.count:
+        summary.shortest_km = result.stats.shortest
+        summary.farthest_km = result.stats.farthest
+        summary.average_km = result.stats.average
+        summary.mean_nearest_km = float(np.nanmean(result.stats.nearest))
+    return summary
+
+
+def _write_brand_map(result, out_dir):
+    with open(os.path.join(out_dir, result.filename), 'w', encoding='utf-8') as file:
+        file.write(result.map_html)
+
+
+def _batch_worker(atm_name, df, out_dir):
+    """Process-pool job: build one brand's map quietly, write it to out_dir and summarize it
+
+    The result is returned too, so the parent can store it in the result cache.
+    """
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = build_brand_result(atm_name, df)
+
+    if result is not None:
+        _write_brand_map(result, out_dir)
+    return summarize_brand(atm_name, result, time.perf_counter() - start), result
+
+
+def write_batch_index(summaries, out_dir):
+    """Write index.html linking every brand map with its distance report, plus distance_report.csv"""
+    report = pd.DataFrame([asdict(summary) for summary in summaries])
+    report = report.sort_values(['atms', 'name'], ascending=[False, True])
+    report.to_csv(os.path.join(out_dir, 'distance_report.csv'), index=False)
+
+    def km(value):
+        return '' if pd.isna(value) else f"{value:.2f}"
+
+    rows = []
+    for summary in report.itertuples(index=False):
+        name = html.escape(summary.name)
+        link = f'<a href="{html.escape(summary.filename)}">{name}</a>' if summary.filename else name
+        rows.append(f"<tr><td>{link}</td><td>{summary.atms}</td><td>{km(summary.shortest_km)}</td>"
+                    f"<td>{km(summary.farthest_km)}</td><td>{km(summary.average_km)}</td>"
+                    f"<td>{km(summary.mean_nearest_km)}</td></tr>")
+
+    page = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>ATM maps by brand</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: right; }}
+th:first-child, td:first-child {{ text-align: left; }}
+</style>
+</head>
+<body>
+<h1>ATM maps by brand</h1>
+<p>{len(report)} brands, {int(report['atms'].sum())} ATMs. Generated {time.strftime('%Y-%m-%d %H:%M')}.</p>
+<table>
+<tr><th>Brand</th><th>ATMs</th><th>Shortest (km)</th><th>Farthest (km)</th><th>Average (km)</th><th>Mean nearest (km)</th></tr>
+{chr(10).join(rows)}
+</table>
+</body>
+</html>
+"""
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as file:
+        file.write(page)
+    print(f"\nIndex saved as '{os.path.join(out_dir, 'index.html')}'")
+
+
+def generate_all_maps(names_df, engine, out_dir='.', workers=None, store=None):
+    """Batch mode: map every brand of names_df (from get_all_atm_names) in parallel
+
+    All rows are fetched with one query and partitioned by NAME in memory. Brands are
+    submitted largest first to a pool of worker processes, so with enough workers the
+    run takes about as long as the largest brand rather than the sum of all brands.
+    workers=1 runs everything in this process. With a ResultCache as store, brands
+    whose rows are unchanged since the last run are written from the cache instead.
+    """
+    workers = workers or os.cpu_count()
+    os.makedirs(out_dir, exist_ok=True)
+
+    with stage('batch_maps', workers=workers) as run:
+        with stage('fetch') as s, connection(engine) as conn:
+            df = all_brand_rows(conn)
+            versions = brand_versions(conn) if store is not None else {}
+            s.rows = len(df)
+
+        partitions = dict(tuple(df.groupby('NAME', sort=False)))
+        # names_df is ordered by count, so the longest jobs start first
+        names = [name for name in names_df['NAME'] if name in partitions]
+
+        summaries, jobs = [], []
+        for name in names:
+            cached = store.get(('brand', name), versions.get(name)) if store is not None else None
+            if cached is None:
+                jobs.append((name, partitions[name]))
+                continue
+            _write_brand_map(cached, out_dir)
+            summaries.append(summarize_brand(name, cached))
+        if summaries:
+            print(f"\n{len(summaries)} brands unchanged since the last run, written from the cache")
+        print(f"\nMapping {len(jobs)} brands ({sum(len(rows) for _, rows in jobs)} ATMs) with {workers} worker(s)...")
+
+        def finish(summary, result):
+            summaries.append(summary)
+            print(f"  {summary.name}: {summary.atms} ATMs in {summary.seconds:.2f}s")
+            if store is not None and result is not None:
+                store.put(('brand', summary.name), versions.get(summary.name), result)
+
+        if workers == 1:
+            for name, rows in jobs:
+                finish(*_batch_worker(name, rows, out_dir))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(_batch_worker, name, rows, out_dir): name for name, rows in jobs}
+                for future in as_completed(futures):
+                    try:
+                        summary, result = future.result()
+                    except Exception as e:
+                        print(f"  {futures[future]}: failed ({e})")
+                        continue
+                    finish(summary, result)
+
+        write_batch_index(summaries, out_dir)
+        run.rows = len(df)
+
+    return summaries
+
+
+def brand_main(atm_name):
+    """Map one brand by NAME without prompts"""
+    try:
+        visualize_and_calculate_distances(atm_name, get_engine(), BrandCache(store=ResultCache.from_env()))
+    finally:
+        get_recorder().print_summary()
+        print_checkout_metrics()
+        dispose_engines()
+
+
+def batch_main(out_dir='.', workers=None):
+    """Generate every brand's map and the summary index without prompts"""
+    try:
+        names_df, engine = get_all_atm_names()
+        generate_all_maps(names_df, engine, out_dir=out_dir, workers=workers, store=ResultCache.from_env())
+    finally:
+        get_recorder().print_summary()
+        print_checkout_metrics()
+        dispose_engines()
 
 
 def main():
@@ -150,6 +392,7 @@ def main():
     try:
         # Get all ATM names
         names_df, engine = get_all_atm_names()
+        cache = BrandCache(store=ResultCache.from_env())
 
         print("\n" + "=" * 50)
 
@@ -166,7 +409,7 @@ def main():
                 if 1 <= choice_num <= len(names_df):
                     selected_atm = names_df.iloc[choice_num - 1]['NAME']
                     print(f"\nYou selected: {selected_atm}")
-                    visualize_and_calculate_distances(selected_atm, engine)
+                    visualize_and_calculate_distances(selected_atm, engine, cache)
 
                     # Ask if user wants to continue
                     continue_choice = input("\nDo you want to map another ATM? (y/n): ").strip().lower()
@@ -185,10 +428,28 @@ def main():
     except Exception as e:
         print(f"An error occurred: {e}")
     finally:
-        # Close the database connection
-        if 'engine' in locals():
-            engine.dispose()
+        # Close the pooled database connections
+        get_recorder().print_summary()
+        print_checkout_metrics()
+        dispose_engines()
+
+
+def script_main(argv=None):
+    parser = argparse.ArgumentParser(description="Map ATM brands with distance statistics")
+    parser.add_argument("--all", action="store_true",
+                        help="batch mode: map every brand and write an index page instead of prompting")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for --all (default: CPU count; 1 runs in-process)")
+    parser.add_argument("--out-dir", default=".", help="output directory for --all")
+    args = parser.parse_args(argv)
+    if args.all:
+        batch_main(out_dir=args.out_dir, workers=args.workers)
+    else:
+        main()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Run through the importable module, so cached BrandResults pickle as
+    # visualize_atms.BrandResult rather than __main__.BrandResult
+    import visualize_atms
+    visualize_atms.script_main()
\ No newline at end of file